@@ -0,0 +1,39 @@
+# micro-benchmark for Interpreter.visit dispatch
+#
+#   python benchmarks/dispatch.py
+#
+# times visiting a number literal through the cached dispatch table against
+# the old per-visit name formatting and getattr lookup
+
+import sys
+import timeit
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from safyr.interpreter import Interpreter, Context, Parser, Lexer
+
+
+def getattr_visit(interpreter, node, context):
+    # how Interpreter.visit found its handler before the dispatch table
+    method = getattr(interpreter, f'visit_{type(node).__name__}', Interpreter.no_visit_method)
+    return method(node, context)
+
+
+def main(number=200000, repeat=5):
+    interpreter = Interpreter()
+    context = Context('<bench>')
+    node = Parser(Lexer().tokenize('1').value).parse().node.elements[0]
+
+    cached = min(timeit.repeat(lambda: interpreter.visit(node, context),
+                               number=number, repeat=repeat))
+    uncached = min(timeit.repeat(lambda: getattr_visit(interpreter, node, context),
+                                 number=number, repeat=repeat))
+
+    print(f'getattr dispatch : {uncached / number * 1e9:7.1f} ns/visit')
+    print(f'cached dispatch  : {cached / number * 1e9:7.1f} ns/visit')
+    print(f'saved            : {(uncached - cached) / number * 1e9:7.1f} ns/visit')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ WHT = '\n\t '
 KWDS = ['use', 'by', 'end', 'const', 'global', 'del',
         '?', '!?', '!', 'if', 'elif', 'else',
         'while', 'when', 'for', 'when', 'foreach', 'in',
-        'return', 'continue', 'break', 'once',
+        'return', 'continue', 'break', 'once', 'yield',
         'int', 'flt', 'str', 'lst', 'map', 'var',
         'try', 'catch', 'defer']
 
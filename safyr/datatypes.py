@@ -2,8 +2,56 @@ from .typedef import *
 from .errors import *
 from .result import *
 
+import operator
 import os
+import sys
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
 from copy import deepcopy
+from itertools import islice, repeat
+
+# upper bound on the Python frames one SAFyR function call nests
+PY_FRAMES_PER_CALL = 40
+
+# nested SAFyR calls run on one thread before the chain moves to a new one;
+# Python frames that re-enter the interpreter from C, as consuming a
+# generator or lazy built-in does, use the C stack, so no thread may hold
+# more calls than its stack has room for
+CALLS_PER_THREAD = 200
+THREAD_STACK_SIZE = 16 * 1024 * 1024
+
+# Python recursion limit while SAFyR calls run; each thread counts its own depth
+RECURSION_LIMIT = CALLS_PER_THREAD * PY_FRAMES_PER_CALL + 1000
+
+
+def on_new_thread(run, *args):
+    """Return run(*args), called on a new thread with a fresh stack.
+
+    The calling thread waits for it, so only one runs at a time.  Raises
+    RecursionError if no thread can be started, and re-raises whatever run
+    raised.
+    """
+    outcome = []
+
+    def target():
+        try: outcome.append((True, run(*args)))
+        except BaseException as e: outcome.append((False, e))
+
+    size = threading.stack_size()
+    try:
+        threading.stack_size(THREAD_STACK_SIZE)
+        thread = threading.Thread(target=target)
+        thread.start()
+    except (RuntimeError, ValueError, MemoryError) as e: raise RecursionError from e
+    finally: threading.stack_size(size)
+    thread.join()
+
+    ok, value = outcome[0]
+    if not ok: raise value
+    return value
+
 
 class Value:
     """Base class for all built-in data types.
@@ -22,15 +70,20 @@ class Value:
     _const
     _triggers
     """
+    __slots__ = ('value', 'type', 'static', 'constvar', 'triggers', 'frozen',
+                 'pos_start', 'pos_end', 'context')
 
     def __init__(self, t=None, static=False, constvar=False):
-        self.set_pos()
-        self.set_context()
+        self.pos_start = self.pos_end = self.context = None
         self.value = None
         self.type = t
         self.static = static
         self.constvar = constvar
-        self.triggers = []
+        # values without `when` triggers share the empty default; a trigger
+        # gives its value a list, which copies of the value then share
+        self.triggers = ()
+        # frozen values never change in place, so every read can share them
+        self.frozen = False
 
     def __repr__(self):
         return str(self.value)
@@ -48,6 +101,11 @@ class Value:
         self.context = context
         return self
 
+    def freeze(self):
+        # containers can be changed in place through any copy, so only
+        # the scalar types below really freeze
+        return self
+
     # default implementations for all binary operators
     def add(self, other): return None, self.illegal_op(other)
 
@@ -111,10 +169,16 @@ class Value:
 
 
 class Number(Value):
-    
+    __slots__ = ()
+
+    # numbers are made constantly, so this fills in every slot itself
+    # instead of going through Value.__init__
     def __init__(self, value, t=None):
-        super().__init__(t=t if t else 'INT')
+        self.pos_start = self.pos_end = self.context = None
         self.value = value
+        self.type = t if t else 'INT'
+        self.static = self.constvar = self.frozen = False
+        self.triggers = ()
 
     def __eq__(self, other):
         if isinstance(other, Number):
@@ -129,6 +193,7 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value + other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('add', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def sub(self, other):
@@ -136,6 +201,7 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value - other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('sub', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def mul(self, other):
@@ -143,6 +209,7 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value * other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('mul', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def div(self, other):
@@ -154,6 +221,7 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value / other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('div', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def mod(self, other):
@@ -165,6 +233,7 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value % other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('mod', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def pow(self, other):
@@ -172,36 +241,43 @@ class Number(Value):
             ret = self.copy()
             ret.value = self.value ** other.value
             return ret.set_context(self.context), None
+        elif isinstance(other, Array): return other.elementwise('pow', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def eq(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value == other.value)).set_context(self.context), None
-        else: return Number(0), None
+            return Number.truth(self.value == other.value), None
+        elif isinstance(other, Array): return other.elementwise('eq', self, True)
+        else: return Number.false, None
 
     def ne(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value != other.value)).set_context(self.context), None
-        else: return Number(1), None
+            return Number.truth(self.value != other.value), None
+        elif isinstance(other, Array): return other.elementwise('ne', self, True)
+        else: return Number.true, None
 
     def lt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value < other.value)).set_context(self.context), None
+            return Number.truth(self.value < other.value), None
+        elif isinstance(other, Array): return other.elementwise('lt', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def gt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value > other.value)).set_context(self.context), None
+            return Number.truth(self.value > other.value), None
+        elif isinstance(other, Array): return other.elementwise('gt', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def le(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value <= other.value)).set_context(self.context), None
+            return Number.truth(self.value <= other.value), None
+        elif isinstance(other, Array): return other.elementwise('le', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def ge(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value >= other.value)).set_context(self.context), None
+            return Number.truth(self.value >= other.value), None
+        elif isinstance(other, Array): return other.elementwise('ge', self, True)
         else: return None, Value.illegal_op(self, other)
 
     def logand(self, other):
@@ -217,11 +293,10 @@ class Number(Value):
         return Number(not (self.is_true() or other.is_true())).set_context(self.context), None
 
     def logxor(self, other):
-        return Number(int((self.is_true() and not other.is_true()) or (not self.is_true() and other.is_true()))
-                      ).set_context(self.context), None
+        return Number.truth(self.is_true() != other.is_true()), None
 
     def lognot(self):
-        return Number(1 if self.value == 0 else 0).set_context(self.context), None
+        return Number.truth(self.value == 0), None
 
     def at(self, other):
         # @ operator returns the other-th digit from the left on a Number
@@ -235,7 +310,17 @@ class Number(Value):
                                           self.pos_end,
                                           "Index out of range",
                                           self.context)
-        return Number(int(myrepr[other.value])), None
+        return Number.of(int(myrepr[other.value])), None
+
+    @staticmethod
+    def of(value):
+        # the shared frozen Number for a small int, a new Number otherwise
+        if value.__class__ is int and -5 <= value <= 256: return Number.small[value + 5]
+        return Number(value)
+
+    @staticmethod
+    def truth(condition):
+        return Number.true if condition else Number.false
 
     def copy(self):
         copy = Number(self.value)
@@ -249,14 +334,22 @@ class Number(Value):
     def is_true(self):
         return self.value != 0
 
+    def freeze(self):
+        self.frozen = True
+        return self
+
 
-Number.null = Number(0)
-Number.false = Number(0)
-Number.true = Number(1)
+# results that are the same every time are shared instead of made anew;
+# they are frozen, so anything about to change one copies it first
+Number.null = Number(0).freeze()
+Number.false = Number(0).freeze()
+Number.true = Number(1).freeze()
+Number.small = [Number(i).freeze() for i in range(-5, 257)]
 
 
 class String(Value):
-    
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(t='STR')
         self.value = value
@@ -292,32 +385,32 @@ class String(Value):
 
     def eq(self, other):
         if isinstance(other, String):
-            return Number(int(self.value == other.value)).set_context(self.context), None
-        else: return Number(0), None
+            return Number.truth(self.value == other.value), None
+        else: return Number.false, None
 
     def ne(self, other):
         if isinstance(other, String):
-            return Number(int(self.value != other.value)).set_context(self.context), None
-        else: return Number(1), None
+            return Number.truth(self.value != other.value), None
+        else: return Number.true, None
 
     def lt(self, other):
         if isinstance(other, String):
-            return Number(int(self.value < other.value)).set_context(self.context), None
+            return Number.truth(self.value < other.value), None
         else: return None, Value.illegal_op(self, other)
 
     def gt(self, other):
         if isinstance(other, String):
-            return Number(int(self.value > other.value)).set_context(self.context), None
+            return Number.truth(self.value > other.value), None
         else: return None, Value.illegal_op(self, other)
 
     def le(self, other):
         if isinstance(other, String):
-            return Number(int(self.value <= other.value)).set_context(self.context), None
+            return Number.truth(self.value <= other.value), None
         else: return None, Value.illegal_op(self, other)
 
     def ge(self, other):
         if isinstance(other, String):
-            return Number(int(self.value >= other.value)).set_context(self.context), None
+            return Number.truth(self.value >= other.value), None
         else: return None, Value.illegal_op(self, other)
 
     def logand(self, other):
@@ -333,11 +426,10 @@ class String(Value):
         return Number(not (self.is_true() or other.is_true())).set_context(self.context), None
 
     def logxor(self, other):
-        return Number(int((self.is_true() and not other.is_true()) or (not self.is_true() and other.is_true()))
-                      ).set_context(self.context), None
+        return Number.truth(self.is_true() != other.is_true()), None
 
     def lognot(self):
-        return Number(1 if self.value == "" else 0).set_context(self.context), None
+        return Number.truth(self.value == ""), None
 
     def at(self, other):
         if other.type != 'INT':
@@ -376,7 +468,7 @@ class String(Value):
             return None, InvalidSyntaxError(self.pos_start,
                                             self.pos_end,
                                             "Input to STR ~> must be STR")
-        return Number(1) if other.value in self.value else Number(0), None
+        return Number.truth(other.value in self.value), None
 
     def inj(self, other):
         # reserve this for format strings
@@ -394,11 +486,19 @@ class String(Value):
     def is_true(self):
         return self.value != ''
 
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    def iterate(self):
+        return (String(char) for char in self.value)
+
     def __repr__(self):
         return f'"{self.value}"'
 
 
 class FormatString(String):
+    __slots__ = ()
 
     def __init__(self, value):
         super().__init__(value)
@@ -460,11 +560,13 @@ class List(Value):
         self.elements = elements
 
     def add(self, other):
+        Struct.unshare()
         newlist = self.copy()
         newlist.elements.append(other)
         return newlist, None
 
     def sub(self, other):
+        Struct.unshare()
         newlist = self.copy()
         while other in newlist.elements:
             newlist.elements.remove(other)
@@ -539,41 +641,53 @@ class List(Value):
 
     def contains(self, other):
         for elem in self.elements:
+            # an Array's eq compares element by element, so arrays match whole
+            if isinstance(elem, Array) or isinstance(other, Array):
+                if elem == other: return Number.true, None
+                continue
             val, err = elem.eq(other)
             if val:
-                if val.is_true(): return Number(1), None
-        return Number(0), None
+                if val.is_true(): return Number.true, None
+        return Number.false, None
 
     def inj(self, other):
         if not isinstance(other, List):
             return None, InvalidSyntaxError(self.pos_start, self.pos_end,
                                             "Input to LST <~ must be LST")
+        Struct.unshare()
         self.elements.extend(other.elements)
         return self, None
 
     def eq(self, other):
         if not isinstance(other, List):
-            return Number(0), None
+            return Number.false, None
         if len(self.elements) != len(other.elements):
-            return Number(0), None
+            return Number.false, None
         for i in range(len(self.elements)):
             if self.elements[i] != other.elements[i]:
-                return Number(0), None
-        return Number(1), None
+                return Number.false, None
+        return Number.true, None
 
     def ne(self, other):
         if not isinstance(other, List):
-            return Number(1), None
+            return Number.true, None
         if len(self.elements) != len(other.elements):
-            return Number(1), None
+            return Number.true, None
         for i in range(len(self.elements)):
             if self.elements[i] != other.elements[i]:
-                return Number(1), None
-        return Number(0), None
+                return Number.true, None
+        return Number.false, None
 
     def replace(self, idx, other):
+        Struct.unshare()
         self.elements[idx.value] = other
 
+    def length(self):
+        return len(self.elements)
+
+    def iterate(self):
+        return self.elements
+
     def copy(self):
         copy = List(self.elements)
         copy.static = self.static
@@ -586,6 +700,9 @@ class List(Value):
     def __repr__(self):
         return str(self.elements)
 
+    def __hash__(self):
+        return hash(tuple(self.elements))
+
     def __eq__(self, other):
         if not isinstance(other, List):
             return False
@@ -597,6 +714,319 @@ class List(Value):
         return True
 
 
+class Range(List):
+    """List of the integers 0 .. stop - 1 that only builds its elements when
+    something needs them as a real list.
+
+    Length, indexing, membership and iteration are answered from `stop`
+    directly.  Copies share the materialized elements the same way copies of a
+    List share their element list.
+
+    Parameters
+    ----------
+    stop : int
+    """
+
+    def __init__(self, stop):
+        self.cell = [None]
+        super().__init__(None)
+        # like range(), a negative stop gives no elements
+        self.stop = max(0, stop)
+
+    @property
+    def elements(self):
+        if self.cell[0] is None:
+            self.cell[0] = [Number(i) for i in range(self.stop)]
+        return self.cell[0]
+
+    @elements.setter
+    def elements(self, elements):
+        # rebinding detaches this value from its copies, as it does for a List
+        self.cell = [elements]
+
+    def length(self):
+        if self.cell[0] is None: return self.stop
+        return len(self.cell[0])
+
+    def iterate(self):
+        # index by position like a list iterator, so elements added during the
+        # loop are still visited
+        i = 0
+        while i < self.length():
+            yield Number(i) if self.cell[0] is None else self.cell[0][i]
+            i += 1
+
+    def at(self, other):
+        if (self.cell[0] is not None or other.type != 'INT' or
+                not isinstance(other.value, int) or not -self.stop <= other.value < self.stop):
+            return super().at(other)
+        return Number(other.value % self.stop), None
+
+    def contains(self, other):
+        if self.cell[0] is not None: return super().contains(other)
+        if not isinstance(other, Number): return Number.false, None
+        value = other.value
+        if isinstance(value, float):
+            if not value.is_integer(): return Number.false, None
+            value = int(value)
+        return Number.truth(0 <= value < self.stop), None
+
+    def copy(self):
+        copy = Range(self.stop)
+        copy.cell = self.cell
+        copy.static = self.static
+        copy.constvar = self.constvar
+        copy.triggers = self.triggers
+        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_context(self.context)
+        return copy
+
+
+class Array(Value):
+    """Sequence of numbers of a single type, stored unboxed in an array.array.
+
+    Arithmetic and comparison operators work on every element at once, pairing
+    the elements with those of an Array of the same length or with a single
+    Number, and give a new Array; comparisons give an INT array of 0s and 1s.
+    An Array is true if any of its elements is nonzero, so `? a == 7` asks
+    whether a holds a 7.  Elements are only boxed into Numbers when read one
+    at a time.  Copies share their storage the same way copies of a List
+    share their elements.  Arrays change in place, so they can't be map keys.
+
+    Parameters
+    ----------
+    elements : array.array
+        Typecode 'q' for an INT array, 'd' for a FLT one.
+    """
+
+    # operator method -> (function, typecode of the result or None for the
+    # wider of the operands' typecodes)
+    OPS = {'add': (operator.add, None),
+           'sub': (operator.sub, None),
+           'mul': (operator.mul, None),
+           'div': (operator.truediv, 'd'),
+           'mod': (operator.mod, None),
+           'pow': (operator.pow, None),
+           'eq' : (operator.eq, 'q'),
+           'ne' : (operator.ne, 'q'),
+           'lt' : (operator.lt, 'q'),
+           'gt' : (operator.gt, 'q'),
+           'le' : (operator.le, 'q'),
+           'ge' : (operator.ge, 'q')}
+
+    def __init__(self, elements):
+        super().__init__(t='ARR')
+        self.elements = elements
+
+    @staticmethod
+    def build(values):
+        # the Array of an iterable of Values, or None if one isn't a number
+        code = 'q'
+        raw = []
+        for value in values:
+            if not isinstance(value, Number): return None
+            if value.type == 'FLT' or value.value.__class__ is float: code = 'd'
+            raw.append(value.value)
+        try: return Array(array(code, raw))
+        except OverflowError: return None
+
+    def elementwise(self, op, other, reflected=False):
+        # self <op> other, or other <op> self when a Number hands its Array
+        # operand over
+        fn, code = Array.OPS[op]
+        size = len(self.elements)
+        if isinstance(other, Number):
+            operand = other.value
+            floats = other.type == 'FLT' or operand.__class__ is float
+            def others(): return repeat(operand, size)
+        elif isinstance(other, Array):
+            if len(other.elements) != size:
+                return None, RuntimeError(self.pos_start,
+                                          self.pos_end,
+                                          "Arrays must be of the same size",
+                                          self.context)
+            floats = other.elements.typecode == 'd'
+            def others(): return other.elements
+        elif op == 'eq': return Number.false, None
+        elif op == 'ne': return Number.true, None
+        else: return None, Value.illegal_op(self, other)
+
+        if op in ('div', 'mod'):
+            divisor = self if reflected else other
+            zero = 0 in divisor.elements if isinstance(divisor, Array) else divisor.value == 0
+            if zero: return None, RuntimeError(divisor.pos_start,
+                                               divisor.pos_end,
+                                               'Division by zero' if op == 'div' else 'Modulo by zero',
+                                               self.context)
+
+        if code is None: code = 'd' if floats or self.elements.typecode == 'd' else 'q'
+        def run(code):
+            if reflected: return array(code, map(fn, others(), self.elements))
+            return array(code, map(fn, self.elements, others()))
+        try:
+            try: elements = run(code)
+            except TypeError:
+                # a negative power of an INT is a FLT
+                if op != 'pow' or code != 'q': raise
+                elements = run('d')
+        except (TypeError, OverflowError, ZeroDivisionError):
+            return None, RuntimeError(self.pos_start,
+                                      self.pos_end,
+                                      "Result doesn't fit in an array",
+                                      self.context)
+        return Array(elements).set_context(self.context).set_pos(self.pos_start, self.pos_end), None
+
+    def add(self, other): return self.elementwise('add', other)
+
+    def sub(self, other): return self.elementwise('sub', other)
+
+    def mul(self, other): return self.elementwise('mul', other)
+
+    def div(self, other): return self.elementwise('div', other)
+
+    def mod(self, other): return self.elementwise('mod', other)
+
+    def pow(self, other): return self.elementwise('pow', other)
+
+    def eq(self, other): return self.elementwise('eq', other)
+
+    def ne(self, other): return self.elementwise('ne', other)
+
+    def lt(self, other): return self.elementwise('lt', other)
+
+    def gt(self, other): return self.elementwise('gt', other)
+
+    def le(self, other): return self.elementwise('le', other)
+
+    def ge(self, other): return self.elementwise('ge', other)
+
+    def at(self, other):
+        if other.type != 'INT':
+            return None, InvalidSyntaxError(self.pos_start, self.pos_end,
+                                            "Input to '@' must be INT")
+        elif not -len(self.elements) <= other.value < len(self.elements):
+            return None, OutOfBoundsError(self.pos_start,
+                                          self.pos_end,
+                                          "Index out of range",
+                                          self.context)
+        return self.box(self.elements[other.value]), None
+
+    def sliceleft(self, other):
+        if other.type != 'INT':
+            return None, InvalidSyntaxError(self.pos_start, self.pos_end,
+                                            "Input to '</' must be INT")
+        newarray = self.copy()
+        newarray.elements = self.elements[:other.value]
+        return newarray, None
+
+    def sliceright(self, other):
+        if other.type != 'INT':
+            return None, InvalidSyntaxError(self.pos_start, self.pos_end,
+                                            "Input to '/>' must be INT")
+        newarray = self.copy()
+        newarray.elements = self.elements[-other.value:] if other.value else self.elements[:0]
+        return newarray, None
+
+    def contains(self, other):
+        if not isinstance(other, Number): return Number.false, None
+        return Number.truth(other.value in self.elements), None
+
+    def replace(self, idx, other):
+        # writes into the storage every copy shares, so returns an error
+        # rather than change the array's type
+        if (not isinstance(other, Number) or
+                (self.elements.typecode == 'q' and other.value.__class__ is float)):
+            return RuntimeError(other.pos_start,
+                                other.pos_end,
+                                f"Array of {self.element_type()} can't hold {other}",
+                                self.context)
+        Struct.unshare()
+        try: self.elements[idx.value if isinstance(idx, Value) else idx] = other.value
+        except OverflowError:
+            return RuntimeError(other.pos_start,
+                                other.pos_end,
+                                "Value doesn't fit in an array",
+                                self.context)
+
+    def is_true(self):
+        return any(self.elements)
+
+    def element_type(self):
+        return 'FLT' if self.elements.typecode == 'd' else 'INT'
+
+    def box(self, raw):
+        return Number(raw, t='FLT') if self.elements.typecode == 'd' else Number.of(raw)
+
+    def length(self):
+        return len(self.elements)
+
+    def iterate(self):
+        return map(self.box, self.elements)
+
+    def copy(self):
+        copy = Array(self.elements)
+        copy.static = self.static
+        copy.constvar = self.constvar
+        copy.triggers = self.triggers
+        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_context(self.context)
+        return copy
+
+    def __repr__(self):
+        return str(self.elements.tolist())
+
+    __hash__ = None
+
+    def __eq__(self, other):
+        return (isinstance(other, Array) and
+                self.elements.typecode == other.elements.typecode and
+                self.elements == other.elements)
+
+
+class Iterator(Value):
+    """Single-pass lazy sequence, returned by generator functions and by the
+    transform, filter, take and zip built-ins.
+
+    Values are produced only as a consumer such as foreach asks for them.
+    Copies share the underlying sequence, so anything one copy consumes is
+    gone for the others.
+
+    Parameters
+    ----------
+    source : iterator
+        Python iterator yielding Values; it raises IteratorError if producing
+        a value fails.
+    """
+
+    def __init__(self, source):
+        super().__init__(t='ITR')
+        self.source = source
+
+    def iterate(self):
+        return self.source
+
+    def copy(self):
+        copy = Iterator(self.source)
+        copy.static = self.static
+        copy.constvar = self.constvar
+        copy.triggers = self.triggers
+        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_context(self.context)
+        return copy
+
+    def __repr__(self):
+        return '<iterator>'
+
+
+class IteratorError(Exception):
+    """Carries a SAFyR error out of a lazily evaluated Iterator to whichever
+    consumer was advancing it."""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
 class Map(Value):
     
     def __init__(self, elements):
@@ -612,13 +1042,23 @@ class Map(Value):
         copy.set_context(self.context)
         return copy
 
+    def iterate(self):
+        return iter(self.elements)
+
     def __repr__(self):
         return str(self.elements)
 
+    def __eq__(self, other):
+        return isinstance(other, Map) and self.elements == other.elements
+
+    def __hash__(self):
+        return hash(frozenset(self.elements.items()))
+
     def add(self, other):
         if not isinstance(other, Map):
             return None, InvalidSyntaxError(self.pos_start, self.pos_end,
                                             "Input to MAP + must be MAP")
+        Struct.unshare()
         newmap = self.copy()
         for key, val in other.elements.items():
             newmap.elements[key] = val
@@ -629,6 +1069,7 @@ class Map(Value):
         present, err = keys.contains(other)
         if not present: return self, None
         elif not present.is_true(): return self, None
+        Struct.unshare()
         newmap = self.copy()
         del newmap.elements[other]
         return newmap, None
@@ -636,25 +1077,25 @@ class Map(Value):
     def contains(self, other):
         keys = List(list(self.elements.keys()))
         present, err = keys.contains(other)
-        if not present: return Number(0), None
-        elif present.is_true(): return Number(1), None
-        return Number(0), None
+        if not present: return Number.false, None
+        elif present.is_true(): return Number.true, None
+        return Number.false, None
 
     def eq(self, other):
-        if not isinstance(other, Map): return Number(0), None
-        if len(self.elements) != len(other.elements): return Number(0), None
+        if not isinstance(other, Map): return Number.false, None
+        if len(self.elements) != len(other.elements): return Number.false, None
         for i in self.elements:
-            if i not in other.elements: return Number(0), None
-            if self.elements[i] != other.elements[i]: return Number(0), None
-        return Number(1), None
+            if i not in other.elements: return Number.false, None
+            if self.elements[i] != other.elements[i]: return Number.false, None
+        return Number.true, None
 
     def ne(self, other):
-        if not isinstance(other, Map): return Number(1), None
-        if len(self.elements) != len(other.elements): return Number(1), None
+        if not isinstance(other, Map): return Number.true, None
+        if len(self.elements) != len(other.elements): return Number.true, None
         for i in self.elements:
-            if i not in other.elements: return Number(1), None
-            if self.elements[i] != other.elements[i]: return Number(1), None
-        return Number(0), None
+            if i not in other.elements: return Number.true, None
+            if self.elements[i] != other.elements[i]: return Number.true, None
+        return Number.false, None
 
     def at(self, other):
         if not self.contains(other)[0].is_true():
@@ -667,7 +1108,17 @@ class Map(Value):
 
 
 class Struct(Value):
-    
+    """Instance of a struct.
+
+    Copies share their properties with the struct they were made from, and
+    every copy still alive is kept in Struct.shared.  Anything about to change
+    a value in place calls Struct.unshare first, which gives each of those
+    copies a snapshot of its own, so a copy looks exactly as if its properties
+    had been deep copied when it was made.
+    """
+
+    shared = weakref.WeakSet()
+
     def __init__(self, properties, context, instance_name):
         super().__init__(t='STRC')
         self.instance_name = instance_name
@@ -691,12 +1142,21 @@ class Struct(Value):
         return f'{self.properties}'
 
     def update_context(self):
-        for p in self.context.symbol_table.symbols:
+        Struct.unshare()
+        for p, value in self.context.symbol_table.items():
             if p in self.properties:
-                self.properties[p] = self.context.symbol_table.symbols[p]
+                self.properties[p] = value
+
+    @staticmethod
+    def unshare():
+        if not Struct.shared: return
+        for struct in list(Struct.shared):
+            struct.properties = deepcopy(struct.properties)
+        Struct.shared.clear()
 
     def copy(self):
-        copy = Struct(deepcopy(self.properties), self.context, '')
+        copy = Struct(self.properties, self.context, '')
+        Struct.shared.add(copy)
         copy.static = self.static
         copy.constvar = self.constvar
         copy.triggers = self.triggers
@@ -733,9 +1193,12 @@ class BaseFunction(Value):
         super().__init__(t='FNC')
         self.name = name or "<anonymous>"
 
-    def generate_new_context(self):
+    def generate_new_context(self, layout=None):
         new_context = Context(self.name, self.context, self.pos_start, root=self.context.root)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
+        if layout is None:
+            new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
+        else:
+            new_context.symbol_table = FrameSymbolTable(new_context.parent.symbol_table, layout)
         return new_context
 
     def check_args(self, arg_names, args):
@@ -757,7 +1220,8 @@ class BaseFunction(Value):
         for i in range(len(args)):
             arg_name = arg_names[i]
             arg_value = args[i]
-            if not isinstance(arg_value, Struct):
+            # user functions keep the context they were defined in
+            if not isinstance(arg_value, (Struct, Function, Memoized)) and not arg_value.frozen:
                 arg_value.set_context(exec_ctx)
                 exec_ctx.symbol_table.set(arg_name, arg_value)
             else: exec_ctx.symbol_table.set(arg_name, arg_value)
@@ -772,29 +1236,120 @@ class BaseFunction(Value):
 
 class Function(BaseFunction):
     
-    def __init__(self, name, body_node, arg_names, auto_return):
+    def __init__(self, name, body_node, arg_names, auto_return, layout=None, generator=False):
         super().__init__(name)
         self.body_node = body_node
         self.arg_names = arg_names
         self.auto_return = auto_return
+        self.layout = layout
+        self.generator = generator
+        self.arity = len(arg_names)
 
     def execute(self, args, interpreter):
-        res = RuntimeResult()
-        exec_ctx = self.generate_new_context()
+        if self.generator: return self.start_generator(args, interpreter)
+
+        try: return self.descend(interpreter, self.run_frames, args, interpreter)
+        except RecursionError: return RuntimeResult().failure(self.depth_error())
+
+    def descend(self, interpreter, run, *args):
+        # run(*args) one level down the interpreter's call stack, moving to a
+        # new thread every CALLS_PER_THREAD levels; raises RecursionError once
+        # the stack is as deep as the interpreter allows
+        stack = interpreter.call_stack
+        if len(stack) >= interpreter.max_call_depth: raise RecursionError
+
+        # the outermost level puts back the host's limit when it returns
+        host_limit = sys.getrecursionlimit()
+        if host_limit < RECURSION_LIMIT: sys.setrecursionlimit(RECURSION_LIMIT)
+        if stack: host_limit = None
+
+        stack.append(None)
+        try:
+            if len(stack) % CALLS_PER_THREAD: return run(*args)
+            return on_new_thread(run, *args)
+        finally:
+            stack.pop()
+            if host_limit is not None: sys.setrecursionlimit(host_limit)
+
+    def depth_error(self):
+        return RuntimeError(self.pos_start, self.pos_end, 'Maximum call depth exceeded', self.context)
+
+    def run_frames(self, args, interpreter):
+        # each tail call replaces the current frame instead of nesting a new one
+        func = self
+        while True:
+            error = interpreter.tick(func, func.context)
+            if error: return RuntimeResult().failure(error)
 
+            res = RuntimeResult()
+            if func.layout is not None and len(args) == func.arity:
+                exec_ctx = func.enter(args)
+            else:
+                exec_ctx = func.generate_new_context(func.layout)
+                exec_ctx.symbol_table.set(func.name, func.context.symbol_table.get(func.name))
+
+                res.register(func.check_and_populate_args(func.arg_names, args, exec_ctx))
+                if res.should_return(): return res
+            exec_ctx.trampoline = True
+            interpreter.call_stack[-1] = exec_ctx
+
+            value = res.register(interpreter.visit(func.body_node, exec_ctx))
+            # an error's traceback still walks the call's context
+            if func.layout is not None and not res.error: func.layout.release(exec_ctx)
+            if res.should_return() and res.func_return_value is None: return res
+
+            retval = (value if func.auto_return else None) or res.func_return_value or Number.null
+            if not isinstance(retval, TailCall): return res.success(retval)
+            func, args = retval.function, retval.args
+
+    def enter(self, args):
+        # call setup for a resolved function given the right number of
+        # arguments: a pooled table, with the slots written directly
+        layout = self.layout
+        parent = self.context.symbol_table
+        exec_ctx = Context(self.name, self.context, self.pos_start, root=self.context.root)
+        if layout.pool:
+            table = exec_ctx.symbol_table = layout.pool.pop()
+            table.parent = parent
+        else: table = exec_ctx.symbol_table = FrameSymbolTable(parent, layout)
+        table.set(self.name, parent.get(self.name))
+
+        slots = layout.slots
+        frame = table.frame
+        for i in range(self.arity):
+            arg = args[i]
+            if not isinstance(arg, (Struct, Function, Memoized)) and not arg.frozen:
+                arg.set_context(exec_ctx)
+            frame[slots[self.arg_names[i]]] = arg
+        return exec_ctx
+
+    def start_generator(self, args, interpreter):
+        # calling a generator only binds its arguments; the body runs as the
+        # returned Iterator is consumed
+        res = RuntimeResult()
+        exec_ctx = self.generate_new_context(self.layout)
         exec_ctx.symbol_table.set(self.name, self.context.symbol_table.get(self.name))
 
         res.register(self.check_and_populate_args(self.arg_names, args, exec_ctx))
         if res.should_return(): return res
+        return res.success(Iterator(self.generate(exec_ctx, interpreter)))
 
-        value = res.register(interpreter.visit(self.body_node, exec_ctx))
-        if res.should_return() and res.func_return_value is None: return res
-
-        retval = (value if self.auto_return else None) or res.func_return_value or Number.null
-        return res.success(retval)
+    def generate(self, exec_ctx, interpreter):
+        # every resumption runs nested in whatever consumes the value, so it
+        # counts as a call the same way running a function does
+        body = interpreter.resume(self.body_node, exec_ctx)
+        while True:
+            try: value = self.descend(interpreter, next, body)
+            except StopIteration as stop:
+                res = stop.value
+                break
+            except RecursionError: raise IteratorError(self.depth_error())
+            yield value
+        if res.error: raise IteratorError(res.error)
 
     def copy(self):
-        copy = Function(self.name, self.body_node, self.arg_names, self.auto_return)
+        copy = Function(self.name, self.body_node, self.arg_names, self.auto_return,
+                        self.layout, self.generator)
         copy.set_context(self.context)
         copy.set_pos(self.pos_start, self.pos_end)
         return copy
@@ -803,13 +1358,28 @@ class Function(BaseFunction):
         return f"<function {self.name}>"
 
 
+class TailCall:
+    """Pending call returned from a tail position, run by the caller's frame loop.
+
+    Parameters
+    ----------
+    function : Function
+    args     : list of Value
+    """
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+
 class StructGenerator(BaseFunction):
 
-    def __init__(self, name, body_node, arg_names, auto_return):
+    def __init__(self, name, body_node, arg_names, auto_return, layout=None):
         super().__init__(name)
         self.body_node = body_node
         self.arg_names = arg_names
         self.auto_return = auto_return
+        self.layout = layout
 
         self.properties = {}
 
@@ -818,7 +1388,7 @@ class StructGenerator(BaseFunction):
 
     def execute(self, args, interpreter):
         res = RuntimeResult()
-        exec_ctx = self.generate_new_context()
+        exec_ctx = self.generate_new_context(self.layout)
         exec_ctx.display_name = f'struct:{exec_ctx.display_name}'
 
         res.register(self.check_and_populate_args(self.arg_names, args, exec_ctx))
@@ -831,14 +1401,14 @@ class StructGenerator(BaseFunction):
         if res.should_return() and res.func_return_value is None: return res
 
         value = Struct(properties, exec_ctx, '')
-        for key, v in exec_ctx.symbol_table.symbols.items():
+        for key, v in exec_ctx.symbol_table.items():
             if isinstance(v, Function): value.interfaces.append(key)
 
         retval = (value if self.auto_return else None) or res.func_return_value or Number.null
         return res.success(retval)
 
     def copy(self):
-        copy = StructGenerator(self.name, self.body_node, self.arg_names, self.auto_return)
+        copy = StructGenerator(self.name, self.body_node, self.arg_names, self.auto_return, self.layout)
         copy.set_context(self.context)
         copy.set_pos(self.pos_start, self.pos_end)
         copy.properties = self.properties
@@ -850,27 +1420,120 @@ class StructGenerator(BaseFunction):
         return f"<struct {self.name}>"
 
 
+class Memoized(BaseFunction):
+    """Function whose results are cached by argument value.
+
+    Copies share the cache, so every reference to the function, including
+    its own recursive calls, is served from the same entries.  Calls passing
+    anything other than numbers, strings and lists or maps of them, such as a
+    struct, always run the function and are left out of the statistics.
+
+    Parameters
+    ----------
+    function : BaseFunction
+        The function being wrapped.  It should be pure, since a call with
+        arguments equal to an earlier one doesn't run it again.
+    maxsize  : int
+        Most results kept; the least recently used is evicted past that.
+        0 keeps every result.
+    """
+
+    def __init__(self, function, maxsize):
+        super().__init__(function.name)
+        self.function = function
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def execute(self, args, interpreter):
+        # structs, functions and the like are only equal to themselves and
+        # every read hands back a fresh copy, so such calls are never cached
+        if not all(self.keyable(arg) for arg in args):
+            return self.function.execute(args, interpreter)
+
+        key = tuple(self.snapshot(arg) for arg in args)
+        cache = self.cache
+        if key in cache:
+            cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return RuntimeResult().success(self.snapshot(cache[key]))
+
+        self.stats['misses'] += 1
+        res = self.function.execute(args, interpreter)
+        if res.should_return(): return res
+
+        cache[key] = self.snapshot(res.value)
+        if self.maxsize and len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.stats['evictions'] += 1
+        return res
+
+    @staticmethod
+    def keyable(value):
+        # True if value can be compared by its contents
+        if isinstance(value, (Number, String)): return True
+        if isinstance(value, List): return all(Memoized.keyable(el) for el in value.elements)
+        if isinstance(value, Map):
+            return all(Memoized.keyable(k) and Memoized.keyable(v) for k, v in value.elements.items())
+        return False
+
+    @staticmethod
+    def snapshot(value):
+        # lists and maps are keyed and cached by their contents at the time of
+        # the call, so later changes to them can't reach the cache
+        if isinstance(value, List):
+            return List([Memoized.snapshot(el) for el in value.elements])
+        if isinstance(value, Map):
+            return Map({Memoized.snapshot(k): Memoized.snapshot(v) for k, v in value.elements.items()})
+        return value
+
+    def clear(self):
+        self.cache.clear()
+        for stat in self.stats: self.stats[stat] = 0
+
+    def copy(self):
+        copy = Memoized(self.function, self.maxsize)
+        copy.cache = self.cache
+        copy.stats = self.stats
+        copy.set_context(self.context)
+        copy.set_pos(self.pos_start, self.pos_end)
+        return copy
+
+    def __repr__(self):
+        return f"<memoized function {self.name}>"
+
+
 class BuiltInFunction(BaseFunction):
-    
+    """Function implemented by one of the execute_* methods below.
+
+    The method gets the call's arguments positionally, plus the interpreter
+    for lazy built-ins that call back into SAFyR functions.  No context is
+    made for the call unless it fails and needs one for the traceback.
+
+    Parameters
+    ----------
+    name : str
+        Suffix of the execute_* method implementing the function.
+    """
+
     def __init__(self, name):
         super().__init__(name)
+        self.method = getattr(BuiltInFunction, f'execute_{name}', None)
 
     def execute(self, args, interpreter):
-        res = RuntimeResult()
-        exec_ctx = self.generate_new_context()
-
-        method_name = f'execute_{self.name}'
-        method = getattr(self, method_name, self.no_visit_method)
+        method = self.method
+        if method is None: raise Exception(f'No execute_{self.name} method defined')
 
-        res.register(self.check_and_populate_args(method.arg_names, args, exec_ctx))
+        res = self.check_args(method.arg_names, args)
         if res.should_return(): return res
 
-        return_value = res.register(method(exec_ctx))
-        if res.should_return(): return res
-        return res.success(return_value)
+        # lazy built-ins call back into SAFyR functions while they are consumed
+        if getattr(method, 'lazy', False): return method(self, *args, interpreter)
+        return method(self, *args)
 
-    def no_visit_method(self, node, context):
-        raise Exception(f'No execute_{self.name} method defined')
+    def call_context(self):
+        # the context a failing call reports its error in
+        return Context(self.name, self.context, self.pos_start, root=self.context.root)
 
     def copy(self):
         copy = BuiltInFunction(self.name)
@@ -881,24 +1544,24 @@ class BuiltInFunction(BaseFunction):
     def __repr__(self):
         return f"<built-in function {self.name}>"
 
-    def execute_print(self, exec_ctx):
-        print(str(exec_ctx.symbol_table.get('value')))
-        return RuntimeResult().success(Number(0))
+    def execute_print(self, value):
+        print(str(value))
+        return RuntimeResult().success(Number.null)
 
     execute_print.arg_names = ['value']
 
-    def execute_rprint(self, exec_ctx):
-        return RuntimeResult().success(String(str(exec_ctx.symbol_table.get('value'))))
+    def execute_rprint(self, value):
+        return RuntimeResult().success(String(str(value)))
 
     execute_rprint.arg_names = ['value']
 
-    def execute_input(self, exec_ctx):
+    def execute_input(self):
         text = input()
         return RuntimeResult().success(String(text))
 
     execute_input.arg_names = []
 
-    def execute_input_int(self, exec_ctx):
+    def execute_input_int(self):
         while True:
             text = input()
             try:
@@ -910,148 +1573,136 @@ class BuiltInFunction(BaseFunction):
 
     execute_input_int.arg_names = []
 
-    def execute_clear(self, exec_ctx):
+    def execute_clear(self):
         os.system('cls' if os.name == 'nt' else 'cls')
-        return RuntimeResult().success(Number(0))
+        return RuntimeResult().success(Number.null)
 
     execute_clear.arg_names = []
 
-    def execute_type(self, exec_ctx):
-        t = exec_ctx.symbol_table.get("value").type
+    def execute_type(self, value):
+        t = value.type
         return RuntimeResult().success(String(t))
 
     execute_type.arg_names = ["value"]
 
-    def execute_is_number(self, exec_ctx):
-        is_number = isinstance(exec_ctx.symbol_table.get("value"), Number)
+    def execute_is_number(self, value):
+        is_number = isinstance(value, Number)
         return RuntimeResult().success(Number.true if is_number else Number.false)
 
     execute_is_number.arg_names = ["value"]
 
-    def execute_is_string(self, exec_ctx):
-        is_number = isinstance(exec_ctx.symbol_table.get("value"), String)
+    def execute_is_string(self, value):
+        is_number = isinstance(value, String)
         return RuntimeResult().success(Number.true if is_number else Number.false)
 
     execute_is_string.arg_names = ["value"]
 
-    def execute_is_list(self, exec_ctx):
-        is_number = isinstance(exec_ctx.symbol_table.get("value"), List)
+    def execute_is_list(self, value):
+        is_number = isinstance(value, List)
         return RuntimeResult().success(Number.true if is_number else Number.false)
 
     execute_is_list.arg_names = ["value"]
 
-    def execute_is_function(self, exec_ctx):
-        is_number = isinstance(exec_ctx.symbol_table.get("value"), BaseFunction)
+    def execute_is_function(self, value):
+        is_number = isinstance(value, BaseFunction)
         return RuntimeResult().success(Number.true if is_number else Number.false)
 
     execute_is_function.arg_names = ["value"]
 
-    def execute_pop(self, exec_ctx):
-        list_ = exec_ctx.symbol_table.get("list")
-        index = exec_ctx.symbol_table.get("index")
-
+    def execute_pop(self, list_, index):
         if not isinstance(list_, List):
             return RuntimeResult().failure(RuntimeError(
                 self.pos_start, self.pos_end,
                 "First argument must be list",
-                exec_ctx
+                self.call_context()
             ))
 
         if not isinstance(index, Number):
             return RuntimeResult().failure(RuntimeError(self.pos_start,
                                                         self.pos_end,
                                                         "Second argument must be number",
-                                                        exec_ctx))
+                                                        self.call_context()))
             
+        Struct.unshare()
         try: element = list_.elements.pop(index.value)
         except: return RuntimeResult().failure(OutOfBoundsError(self.pos_start,
                                                                 self.pos_end,
                                                                 f'Index {index.value} out of bounds',
-                                                                exec_ctx))
+                                                                self.call_context()))
         return RuntimeResult().success(element)
 
     execute_pop.arg_names = ["list", "index"]
 
-    def execute_append(self, exec_ctx):
-        list_ = exec_ctx.symbol_table.get("list")
-        value = exec_ctx.symbol_table.get("value")
-
+    def execute_append(self, list_, value):
         if not isinstance(list_, List):
             return RuntimeResult().failure(RuntimeError(self.pos_start,
                                                         self.pos_end,
                                                         "First argument must be list",
-                                                        exec_ctx))
+                                                        self.call_context()))
 
+        Struct.unshare()
         list_.elements.append(value)
         return RuntimeResult().success(Number.null)
 
     execute_append.arg_names = ["list", "value"]
 
-    def execute_extend(self, exec_ctx):
-        listA = exec_ctx.symbol_table.get("listA")
-        listB = exec_ctx.symbol_table.get("listB")
-
+    def execute_extend(self, listA, listB):
         if not isinstance(listA, List):
             return RuntimeResult().failure(RuntimeError(
                 self.pos_start, self.pos_end,
                 "First argument must be list",
-                exec_ctx))
+                self.call_context()))
 
         if not isinstance(listB, List):
             return RuntimeResult().failure(RuntimeError(
                 self.pos_start, self.pos_end,
                 "Second argument must be list",
-                exec_ctx))
+                self.call_context()))
 
+        Struct.unshare()
         listA.elements.extend(listB.elements)
-        return RuntimeResult().success(Number(0))
+        return RuntimeResult().success(Number.null)
 
     execute_extend.arg_names = ["listA", "listB"]
 
-    def execute_keys(self, exec_ctx):
-        m = exec_ctx.symbol_table.get("map")
-
+    def execute_keys(self, m):
         if not isinstance(m, Map):
             return RuntimeResult().failure(RuntimeError(
                 self.pos_start, self.pos_end,
                 "Invalid input to keys()",
-                exec_ctx))
+                self.call_context()))
 
         return RuntimeResult().success(List(list(m.elements.keys())))
 
     execute_keys.arg_names = ["map"]
 
-    def execute_values(self, exec_ctx):
-        m = exec_ctx.symbol_table.get("map")
-
+    def execute_values(self, m):
         if not isinstance(m, Map):
             return RuntimeResult().failure(RuntimeError(
                 self.pos_start, self.pos_end,
                 "Invalid input to values()",
-                exec_ctx))
+                self.call_context()))
 
         return RuntimeResult().success(List(list(m.elements.values())))
 
     execute_values.arg_names = ["map"]
 
-    def execute_open(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("value")
-        mode = exec_ctx.symbol_table.get("mode")
+    def execute_open(self, val, mode):
         if not isinstance(val, String):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         "Filename must be of type STR",
-                                                        exec_ctx))
+                                                        self.call_context()))
         if not isinstance(mode, String):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         "File access mode must be of type STR",
-                                                        exec_ctx))
+                                                        self.call_context()))
         if (not os.path.exists(val.value)) and (mode == 'r'):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         F"File {val} not found",
-                                                        exec_ctx))
+                                                        self.call_context()))
 
         try:
             f = File(val, mode)
@@ -1061,50 +1712,47 @@ class BuiltInFunction(BaseFunction):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         F"Error opening file {val}",
-                                                        exec_ctx))
+                                                        self.call_context()))
 
     execute_open.arg_names = ["value", "mode"]
 
-    def execute_read(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("value")
+    def execute_read(self, val):
         if not isinstance(val, File):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"{val} is not of type FILE",
-                                                        exec_ctx))
+                                                        self.call_context()))
         if val.mode.value != 'r':
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"{val} is not open in 'read' mode",
-                                                        exec_ctx))
+                                                        self.call_context()))
         try:
             return RuntimeResult().success(String(val.fobj.read()))
         except:
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         F"Error reading file {val}",
-                                                        exec_ctx))
+                                                        self.call_context()))
 
     execute_read.arg_names = ["value"]
 
-    def execute_write(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("value")
-        data = exec_ctx.symbol_table.get("data")
+    def execute_write(self, val, data):
         if not isinstance(val, File):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"{val} is not of type FILE",
-                                                        exec_ctx))
+                                                        self.call_context()))
         if not isinstance(data, String):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"Data is not of type STR",
-                                                        exec_ctx))
+                                                        self.call_context()))
         if val.mode.value != 'w':
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"{val} is not open in 'write' mode",
-                                                        exec_ctx))
+                                                        self.call_context()))
         try:
             val.fobj.write(data.value)
             return RuntimeResult().success(Number.null)
@@ -1112,17 +1760,16 @@ class BuiltInFunction(BaseFunction):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         F"Error reading file {val}",
-                                                        exec_ctx))
+                                                        self.call_context()))
 
     execute_write.arg_names = ["value", "data"]
 
-    def execute_close(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("value")
+    def execute_close(self, val):
         if not isinstance(val, File):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"{val} is not of type FILE",
-                                                        exec_ctx))
+                                                        self.call_context()))
         try:
             val.fobj.close()
             val.fobj = None
@@ -1130,47 +1777,208 @@ class BuiltInFunction(BaseFunction):
         except: return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                             val.pos_end,
                                                             F"Error closing file {val}",
-                                                            exec_ctx))
+                                                            self.call_context()))
 
     execute_close.arg_names = ["value"]
 
-    def execute_range(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("value")
+    def execute_range(self, val):
         if not isinstance(val, Number):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"Input to range must be INT",
-                                                        exec_ctx))
-        nums = list(range(int(val.value)))
-        return RuntimeResult().success(List([Number(i) for i in nums]))
+                                                        self.call_context()))
+        return RuntimeResult().success(Range(int(val.value)))
 
     execute_range.arg_names = ["value"]
 
-    def execute_rand(self, exec_ctx):
+    def execute_rand(self):
         return RuntimeResult().success(Number(random(), t='FLT'))
 
     execute_rand.arg_names = []
 
-    def execute_len(self, exec_ctx):
-        val = exec_ctx.symbol_table.get("container")
-        if not (isinstance(val, List) or isinstance(val, String) or isinstance(val, Map)):
+    def execute_len(self, val):
+        if not (isinstance(val, List) or isinstance(val, Array) or isinstance(val, String) or isinstance(val, Map)):
             return RuntimeResult().failure(RuntimeError(val.pos_start,
                                                         val.pos_end,
                                                         f"Input to len must be container",
-                                                        exec_ctx))
-        if isinstance(val, List) or isinstance(val, Map):
-            return RuntimeResult().success(Number(len(val.elements)))
+                                                        self.call_context()))
+        if isinstance(val, (List, Array)):
+            return RuntimeResult().success(Number(val.length()))
+        elif isinstance(val, Map):
+            return RuntimeResult().success(Number.of(len(val.elements)))
         elif isinstance(val, String):
-            return RuntimeResult().success(Number(len(val.value)))
+            return RuntimeResult().success(Number.of(len(val.value)))
 
     execute_len.arg_names = ["container"]
 
-    def execute_clear(self, exec_ctx):
+    def execute_clear(self):
         os.system('cls' if os.name == 'nt' else 'cls')
-        return RuntimeResult().success(Number(0))
+        return RuntimeResult().success(Number.null)
 
     execute_clear.arg_names = []
 
+    @staticmethod
+    def is_iterable(value):
+        return isinstance(value, (List, Array, Map, String, Iterator))
+
+    def execute_transform(self, function, container, interpreter):
+        if not isinstance(function, BaseFunction) or not self.is_iterable(container):
+            return RuntimeResult().failure(RuntimeError(container.pos_start,
+                                                        container.pos_end,
+                                                        f"Input to transform must be FUN and container",
+                                                        self.call_context()))
+
+        def mapped():
+            for elem in container.iterate():
+                res = function.execute([elem], interpreter)
+                if res.error: raise IteratorError(res.error)
+                yield res.value
+        return RuntimeResult().success(Iterator(mapped()))
+
+    execute_transform.arg_names = ["function", "container"]
+    execute_transform.lazy = True
+
+    def execute_filter(self, function, container, interpreter):
+        if not isinstance(function, BaseFunction) or not self.is_iterable(container):
+            return RuntimeResult().failure(RuntimeError(container.pos_start,
+                                                        container.pos_end,
+                                                        f"Input to filter must be FUN and container",
+                                                        self.call_context()))
+
+        def filtered():
+            for elem in container.iterate():
+                res = function.execute([elem], interpreter)
+                if res.error: raise IteratorError(res.error)
+                if res.value.is_true(): yield elem
+        return RuntimeResult().success(Iterator(filtered()))
+
+    execute_filter.arg_names = ["function", "container"]
+    execute_filter.lazy = True
+
+    def execute_take(self, container, count, interpreter):
+        if (not self.is_iterable(container) or not isinstance(count, Number) or
+                not isinstance(count.value, int) or count.value < 0):
+            return RuntimeResult().failure(RuntimeError(count.pos_start,
+                                                        count.pos_end,
+                                                        f"Input to take must be container and non-negative INT",
+                                                        self.call_context()))
+        return RuntimeResult().success(Iterator(islice(container.iterate(), count.value)))
+
+    execute_take.arg_names = ["container", "count"]
+    execute_take.lazy = True
+
+    def execute_zip(self, first, second, interpreter):
+        if not self.is_iterable(first) or not self.is_iterable(second):
+            return RuntimeResult().failure(RuntimeError(second.pos_start,
+                                                        second.pos_end,
+                                                        f"Input to zip must be containers",
+                                                        self.call_context()))
+        pairs = (List([a, b]) for a, b in zip(first.iterate(), second.iterate()))
+        return RuntimeResult().success(Iterator(pairs))
+
+    execute_zip.arg_names = ["first", "second"]
+    execute_zip.lazy = True
+
+    def execute_memo(self, function, size):
+        if (not isinstance(function, BaseFunction) or getattr(function, 'generator', False) or
+                not isinstance(size, Number) or not isinstance(size.value, int) or size.value < 0):
+            return RuntimeResult().failure(RuntimeError(self.pos_start,
+                                                        self.pos_end,
+                                                        f"Input to memo must be non-generator FUN and non-negative INT",
+                                                        self.call_context()))
+        if isinstance(function, Memoized): function = function.function
+        return RuntimeResult().success(Memoized(function, size.value).set_context(function.context))
+
+    execute_memo.arg_names = ["function", "size"]
+
+    def execute_memostats(self, function):
+        if not isinstance(function, Memoized):
+            return RuntimeResult().failure(RuntimeError(self.pos_start,
+                                                        self.pos_end,
+                                                        f"Input to memostats must be memoized FUN",
+                                                        self.call_context()))
+        stats = {String(stat): Number(count) for stat, count in function.stats.items()}
+        stats[String('size')] = Number(len(function.cache))
+        stats[String('maxsize')] = Number(function.maxsize)
+        return RuntimeResult().success(Map(stats))
+
+    execute_memostats.arg_names = ["function"]
+
+    def execute_memoclear(self, function):
+        if not isinstance(function, Memoized):
+            return RuntimeResult().failure(RuntimeError(self.pos_start,
+                                                        self.pos_end,
+                                                        f"Input to memoclear must be memoized FUN",
+                                                        self.call_context()))
+        function.clear()
+        return RuntimeResult().success(Number.null)
+
+    execute_memoclear.arg_names = ["function"]
+
+    def numbers(self, container, empty=True):
+        # the Array of a container's numbers, or the error to fail the call with
+        numbers = None
+        if isinstance(container, Array): numbers = container
+        elif isinstance(container, Range) and container.cell[0] is None:
+            numbers = Array(array('q', range(container.stop)))
+        elif isinstance(container, (List, Iterator)):
+            try: numbers = Array.build(container.iterate())
+            except IteratorError as e: return None, e.error
+
+        if numbers is None:
+            return None, RuntimeError(container.pos_start,
+                                      container.pos_end,
+                                      f"Input to {self.name} must be container of numbers",
+                                      self.call_context())
+        if not empty and not numbers.elements:
+            return None, RuntimeError(container.pos_start,
+                                      container.pos_end,
+                                      f"Input to {self.name} must not be empty",
+                                      self.call_context())
+        return numbers, None
+
+    def execute_array(self, container):
+        numbers, error = self.numbers(container)
+        if error: return RuntimeResult().failure(error)
+        # an array made from another gets storage of its own
+        if numbers is container: numbers = Array(array(container.elements.typecode, container.elements))
+        return RuntimeResult().success(numbers)
+
+    execute_array.arg_names = ["container"]
+
+    def execute_is_array(self, value):
+        return RuntimeResult().success(Number.truth(isinstance(value, Array)))
+
+    execute_is_array.arg_names = ["value"]
+
+    def execute_sum(self, container):
+        numbers, error = self.numbers(container)
+        if error: return RuntimeResult().failure(error)
+        return RuntimeResult().success(numbers.box(sum(numbers.elements)))
+
+    execute_sum.arg_names = ["container"]
+
+    def execute_min(self, container):
+        numbers, error = self.numbers(container, empty=False)
+        if error: return RuntimeResult().failure(error)
+        return RuntimeResult().success(numbers.box(min(numbers.elements)))
+
+    execute_min.arg_names = ["container"]
+
+    def execute_max(self, container):
+        numbers, error = self.numbers(container, empty=False)
+        if error: return RuntimeResult().failure(error)
+        return RuntimeResult().success(numbers.box(max(numbers.elements)))
+
+    execute_max.arg_names = ["container"]
+
+    def execute_mean(self, container):
+        numbers, error = self.numbers(container, empty=False)
+        if error: return RuntimeResult().failure(error)
+        return RuntimeResult().success(Number(sum(numbers.elements) / len(numbers.elements), t='FLT'))
+
+    execute_mean.arg_names = ["container"]
+
 
 BuiltInFunction.print = BuiltInFunction("print")
 BuiltInFunction.rprint = BuiltInFunction("rprint")
@@ -1194,3 +2002,16 @@ BuiltInFunction.close = BuiltInFunction("close")
 BuiltInFunction.range = BuiltInFunction("range")
 BuiltInFunction.len = BuiltInFunction("len")
 BuiltInFunction.rand = BuiltInFunction("rand")
+BuiltInFunction.transform = BuiltInFunction("transform")
+BuiltInFunction.filter = BuiltInFunction("filter")
+BuiltInFunction.take = BuiltInFunction("take")
+BuiltInFunction.zip = BuiltInFunction("zip")
+BuiltInFunction.memo = BuiltInFunction("memo")
+BuiltInFunction.memostats = BuiltInFunction("memostats")
+BuiltInFunction.memoclear = BuiltInFunction("memoclear")
+BuiltInFunction.array = BuiltInFunction("array")
+BuiltInFunction.is_array = BuiltInFunction("is_array")
+BuiltInFunction.sum = BuiltInFunction("sum")
+BuiltInFunction.min = BuiltInFunction("min")
+BuiltInFunction.max = BuiltInFunction("max")
+BuiltInFunction.mean = BuiltInFunction("mean")
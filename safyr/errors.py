@@ -103,7 +103,6 @@ class RuntimeError(SyntaxError):
     def __init__(self, pos_start, pos_end, details, context):
         super().__init__(pos_start, pos_end, 'RuntimeError', details)
         self.context = context
-        result = self.generate_traceback()
 
     def __repr__(self):
         mystr = self.generate_traceback()
@@ -136,3 +135,10 @@ class OutOfBoundsError(RuntimeError):
 class NotImplementedError(RuntimeError):
     def __init__(self, pos_start, pos_end, details, context):
         super().__init__(pos_start, pos_end, details, context)
+
+
+# raised when a program runs past the interpreter's step or time limit;
+# try/catch blocks do not catch it
+class ResourceLimitError(RuntimeError):
+    def __init__(self, pos_start, pos_end, details, context):
+        super().__init__(pos_start, pos_end, details, context)
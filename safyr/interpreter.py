@@ -1,3 +1,7 @@
+import inspect
+import sys
+import time
+
 from .lexer import Lexer
 from .parser import (Parser, StringNode, ReferenceAssignNode,
                     VarAccessNode, NumberNode, BinOpNode,
@@ -6,14 +10,123 @@ from .typedef import *
 from .datatypes import *
 from .errors import *
 from .constants import *
+from .specialize import Deopt, numeric_closure
 
 
 class Interpreter:
+
+    # SAFyR calls nested deeper than this fail with a RuntimeError
+    max_call_depth = 100000
+
+    # steps taken between looks at the clock when a time limit is set
+    clock_period = 1000
+
+    # visit_* attribute for each node type, looked up once per class; every
+    # subclass starts with an empty table of its own so its visitors are found
+    dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.dispatch = {}
+
+    def __init__(self, max_steps=None, time_limit=None):
+        # contexts of the SAFyR function calls currently executing
+        self.call_stack = []
+        self.limit(max_steps, time_limit)
+        # bound visit_* method for each node type this interpreter has seen
+        self.handlers = {}
+        # value_* method for each node type seen so far, or None if it has none
+        self.value_methods = {}
+
     def visit(self, node, context):
-        method_name = f'visit_{type(node).__name__}'
-        method = getattr(self, method_name, Interpreter.no_visit_method)
-        val = method(node, context)
-        return val
+        try: method = self.handlers[node.__class__]
+        except KeyError: method = self.handler(node.__class__)
+        return method(node, context)
+
+    def handler(self, node_type):
+        """Bind and cache the visit_* method for node_type."""
+        cls = type(self)
+        try: attr = cls.dispatch[node_type]
+        except KeyError:
+            attr = inspect.getattr_static(cls, f'visit_{node_type.__name__}', None)
+            if attr is None: attr = inspect.getattr_static(cls, 'no_visit_method')
+            cls.dispatch[node_type] = attr
+        method = self.handlers[node_type] = attr.__get__(self, cls)
+        return method
+
+    def limit(self, max_steps=None, time_limit=None):
+        """Bound the work the interpreter may do from now on.
+
+        Every loop iteration and every function call is one step.  Once either
+        limit is passed, the step being taken fails with a ResourceLimitError,
+        and so does every step after it.
+
+        Parameters
+        ----------
+        max_steps  : int or None
+            Steps allowed, or None for no limit.
+        time_limit : float or None
+            Seconds allowed, or None for no limit.
+        """
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.steps_left = max_steps
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.period = self.countdown = self.next_period()
+
+    def next_period(self):
+        # steps until the limits next need looking at
+        period = sys.maxsize if self.deadline is None else self.clock_period
+        if self.steps_left is not None: period = max(1, min(period, self.steps_left + 1))
+        return period
+
+    @staticmethod
+    def depth_error(node, context):
+        # for Python recursion that ran out while consuming a container
+        return RuntimeError(node.pos_start, node.pos_end, 'Maximum call depth exceeded', context)
+
+    @staticmethod
+    def key_error(key, node, context):
+        # for a map key Python can't hash, i.e. an Array or something holding one
+        return RuntimeError(node.pos_start, node.pos_end, f'{key} cannot be a map key', context)
+
+    def tick(self, node, context):
+        """Charge one step; returns a ResourceLimitError once a limit is passed."""
+        self.countdown -= 1
+        if self.countdown > 0: return None
+
+        if self.steps_left is not None:
+            self.steps_left -= self.period
+            if self.steps_left < 0:
+                self.period = self.countdown = 1
+                return ResourceLimitError(node.pos_start, node.pos_end,
+                                          f'Step limit of {self.max_steps} exceeded',
+                                          context)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.period = self.countdown = 1
+            return ResourceLimitError(node.pos_start, node.pos_end,
+                                      f'Time limit of {self.time_limit}s exceeded',
+                                      context)
+        self.period = self.countdown = self.next_period()
+        return None
+
+    def value_of(self, node, context):
+        """Evaluate node straight to its value.
+
+        Expression nodes with a value_* method produce their value without
+        building a RuntimeResult; anything else is visited normally.  Errors,
+        returns, breaks and continues are raised as a Signal carrying the
+        result, which the caller's visit_* method hands back as its own.
+        """
+        try: method = self.value_methods[node.__class__]
+        except KeyError:
+            method = getattr(self, f'value_{node.__class__.__name__}', None)
+            self.value_methods[node.__class__] = method
+        if method is not None: return method(node, context)
+
+        res = self.visit(node, context)
+        if res.should_return(): raise Signal(res)
+        return res.value
 
     @staticmethod
     def no_visit_method(node, context):
@@ -26,46 +139,44 @@ class Interpreter:
 
     @staticmethod
     def visit_NumberNode(node, context):
-        return RuntimeResult().success(
-            Number(node.tok.value,
-                   t=node.tok.type).set_context(context).set_pos(node.pos_start,
-                                                                 node.pos_end)
-        )
+        return RuntimeResult().success(Interpreter.value_NumberNode(node, context))
+
+    # an integer or plain string literal keeps one frozen value for every
+    # evaluation; floats aren't shared, since a copy of a Number is an INT
+    @staticmethod
+    def value_NumberNode(node, context):
+        if node.value is not None: return node.value
+        value = Number(node.tok.value, t=node.tok.type).set_pos(node.pos_start, node.pos_end)
+        if node.tok.type != 'INT': return value.set_context(context)
+        node.value = value.freeze()
+        return value
 
     @staticmethod
     def visit_StringNode(node, context):
+        return RuntimeResult().success(Interpreter.value_StringNode(node, context))
+
+    @staticmethod
+    def value_StringNode(node, context):
+        if node.value is not None: return node.value
         if node.tok.type == 'FSTR':
-            return RuntimeResult().success(
-                FormatString(node.tok.value,).set_context(context).set_pos(node.pos_start,
-                                                                           node.pos_end)
-            )
-        return RuntimeResult().success(
-            String(node.tok.value,).set_context(context).set_pos(node.pos_start,
-                                                                 node.pos_end)
-        )
+            return FormatString(node.tok.value,).set_context(context).set_pos(node.pos_start,
+                                                                              node.pos_end)
+        node.value = String(node.tok.value,).set_pos(node.pos_start, node.pos_end).freeze()
+        return node.value
 
     # CapsuleNode object shuttle results around between areas of the program
     # acts just like a ListNode, but i needed those for actual lists in the program
     def visit_CapsuleNode(self, node, context):
         res = RuntimeResult()
         elements = []
-        defers = [i for i in range(len(node.elements)) if isinstance(node.elements[i], DeferNode)]
-        if len(node.elements) > 0:
-            returnidx = -1
-            for idx in defers:
-                node.elements.append(node.elements.pop(idx).body_node)
-            for i in range(len(node.elements)):
-                if isinstance(node.elements[i], ReturnNode):
-                    returnidx = i
-                    break
-            if returnidx != -1: node.elements.append(node.elements.pop(returnidx))
 
-        for el in node.elements:
+        for el in node.plan or self.arrange(node):
             ret = res.register(self.visit(el, context))
             if res.should_return(): return res
             elements.append(ret)
 
         if len(elements) == 1:
+            if elements[0].frozen: return RuntimeResult().success(elements[0])
             if isinstance(elements[0], Struct):
                 return RuntimeResult().success(elements[0].set_pos(node.pos_start, node.pos_end))
             return RuntimeResult().success(elements[0].set_context(context
@@ -73,6 +184,19 @@ class Interpreter:
         return RuntimeResult().success(List(elements).set_context(context
                                                                   ).set_pos(node.pos_start, node.pos_end))
 
+    @staticmethod
+    def arrange(node):
+        # work out once the order a block runs in: deferred statements run after
+        # the rest of the block, then its return
+        plan = [el for el in node.elements if not isinstance(el, DeferNode)]
+        plan += [el.body_node for el in node.elements if isinstance(el, DeferNode)]
+        for i in range(len(plan)):
+            if isinstance(plan[i], ReturnNode):
+                plan.append(plan.pop(i))
+                break
+        node.plan = tuple(plan)
+        return node.plan
+
     def visit_ListNode(self, node, context):
         res = RuntimeResult()
         elements = []
@@ -91,38 +215,56 @@ class Interpreter:
         for key, val in node.elements.items():
             mykey = res.register(self.visit(key, context))
             myval = res.register(self.visit(val, context))
-            elements[mykey] = myval
-
             if res.should_return(): return res
 
+            try: elements[mykey] = myval
+            except TypeError: return res.failure(self.key_error(mykey, key, context))
+
         return RuntimeResult().success(
             Map(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
         )
 
     def visit_BinOpNode(self, node, context):
-        res = RuntimeResult()
+        try: return RuntimeResult().success(self.value_BinOpNode(node, context))
+        except Signal as signal: return signal.result
+
+    def value_BinOpNode(self, node, context):
+        # pure numeric expressions run on raw values and box only the result
+        if node.numeric is None: node.numeric = numeric_closure(node) or False
+        if node.numeric and not context.display_name.startswith('struct'):
+            try: return node.numeric(context)
+            except (Deopt, ArithmeticError, TypeError): pass
 
         # left might have already been evaluated when we get here
         if not isinstance(node.left_node, List):
-            left = res.register(self.visit(node.left_node, context))
+            left = self.value_of(node.left_node, context)
         else: left = node.left_node
 
-        if res.should_return(): return res
         if isinstance(left, Struct) and node.op_tok.type == 'DOT':
             if not isinstance(node.right_node, VarAccessNode):
-                return res.failure(
+                raise Signal(RuntimeResult().failure(
                     VariableAccessError(node.pos_start,
                                         node.pos_end,
                                         f"DOT operator must accept identifier as input")
-                )
+                ))
+
+            # instances of a struct with a layout keep each property at a fixed
+            # slot, so the slot cached at this site is good for every instance
+            table = left.context.symbol_table
+            right = None
+            if table.layout is not None and table.layout is node.ic_layout:
+                right = table.frame[node.ic_slot]
+                if isinstance(right, Struct): right = right.copy()
+                if right: right = right.set_pos(node.right_node.pos_start, node.right_node.pos_end)
 
             # make sure to access the right things if working on a dot operator
-            right = res.register(self.visit(node.right_node, left.context))
-            if res.error: return res
+            if not right:
+                right = self.value_of(node.right_node, left.context)
+                if table.layout is not None:
+                    node.ic_slot = table.slots.get(node.right_node.var_name_tok.value)
+                    node.ic_layout = table.layout if node.ic_slot is not None else None
         else:
-            right = res.register(self.visit(node.right_node, context))
-            if res.error: return res
-        if res.should_return(): return res
+            right = self.value_of(node.right_node, context)
 
         # apply the appropriate operation
         match node.op_tok.type:
@@ -151,12 +293,30 @@ class Interpreter:
             case 'DOT' : result, error = right, None
             case _: pass
 
-        return res.failure(error) if error else res.success(result)
+        if error:
+            self.anchor(error, left, node.left_node, context)
+            self.anchor(error, right, node.right_node, context)
+            raise Signal(RuntimeResult().failure(error))
+        if left.frozen and not result.frozen:
+            self.anchor(result, left, node.left_node, context)
+        return result
+
+    @staticmethod
+    def anchor(target, value, node, context):
+        # a frozen value is shared, so its position and context say nothing
+        # about this use of it; give target, an error or a result made from
+        # the value, the ones this use would have given it
+        if not value.frozen: return
+        if target.pos_start is value.pos_start: target.pos_start = node.pos_start
+        if target.pos_end is value.pos_end: target.pos_end = node.pos_end
+        if getattr(target, 'context', False) is value.context: target.context = context
 
     def visit_UnaryOpNode(self, node, context):
-        res = RuntimeResult()
-        number = res.register(self.visit(node.node, context))
-        if res.should_return(): return res
+        try: return RuntimeResult().success(self.value_UnaryOpNode(node, context))
+        except Signal as signal: return signal.result
+
+    def value_UnaryOpNode(self, node, context):
+        number = operand = self.value_of(node.node, context)
 
         error = None
         if node.op_tok.type == 'MNS':
@@ -164,27 +324,48 @@ class Interpreter:
         if node.op_tok.type == 'NOT':
             number, error = number.lognot()
 
-        if error: return res.failure(error)
-        else: return res.success(number.set_pos(node.pos_start, node.pos_end))
+        if error:
+            self.anchor(error, operand, node.node, context)
+            raise Signal(RuntimeResult().failure(error))
+        if number.frozen: return number
+        if operand.frozen and number.context is operand.context: number.set_context(context)
+        return number.set_pos(node.pos_start, node.pos_end)
 
     # this grabs a value by name from the current local table
     def visit_VarAccessNode(self, node, context):
-        res = RuntimeResult()
+        try: return RuntimeResult().success(self.value_VarAccessNode(node, context))
+        except Signal as signal: return signal.result
 
+    @staticmethod
+    def value_VarAccessNode(node, context):
         var_name = node.var_name_tok.value
-        value = context.symbol_table.get(var_name)
+        table = context.symbol_table
+
+        # resolved locals are read straight out of the call frame, and names a
+        # frame holding nothing but its slots can't bind come from further out
+        if node.layout is not None and node.layout is table.layout:
+            value = table.frame[node.slot]
+            if value is None: value = table.get(var_name)
+        elif node.outer is not None and node.outer is table.layout and not table.symbols:
+            value = table.enclosing(var_name)
+        else: value = table.get(var_name)
         if not value:
-            return res.failure(VariableAccessError(node.pos_start,
-                                                   node.pos_end,
-                                                   f"'{var_name}' is not defined"))
+            raise Signal(RuntimeResult().failure(VariableAccessError(node.pos_start,
+                                                                     node.pos_end,
+                                                                     f"'{var_name}' is not defined")))
 
+        # constants can't change, so each read shares the stored value
+        if value.frozen: return value
         if isinstance(value, Struct):
             value = value.copy().set_pos(node.pos_start, node.pos_end)
         elif context.display_name.startswith('struct'):
             value = value.set_pos(node.pos_start, node.pos_end)
+        elif isinstance(value, Function):
+            # user functions keep the context they were defined in
+            value = value.copy().set_pos(node.pos_start, node.pos_end)
         else:
             value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-        return res.success(value)
+        return value
 
     # this assigns values to objects at the end of chained access expressions
     def visit_ReferenceAssignNode(self, node, context):
@@ -225,7 +406,12 @@ class Interpreter:
                     )
 
                 if isinstance(curr_node.left_node, VarAccessNode):
-                    parent = context.symbol_table.symbols[curr_node.left_node.var_name_tok.value]
+                    name = curr_node.left_node.var_name_tok.value
+                    parent = context.symbol_table.get_local(name)
+                    if parent is None:
+                        return res.failure(VariableAccessError(curr_node.left_node.pos_start,
+                                                               curr_node.left_node.pos_end,
+                                                               f"'{name}' is not defined"))
                     break
                 else: curr_node = curr_node.left_node
 
@@ -235,11 +421,14 @@ class Interpreter:
         if parent:
             for i in childidxs:
                 if isinstance(c, Struct):
-                    c = c.context.symbol_table.symbols[i.value]
+                    c = c.context.symbol_table.get_local(i.value)
                 elif isinstance(c, List):
                     try: c = c.elements[i.value]
                     except: c = c.elements[i]
                 elif isinstance(c, Map): c = c.elements[i]
+                elif isinstance(c, Array):
+                    c, error = c.at(i if isinstance(i, Value) else Number(i))
+                    if error: return res.failure(error)
                 parents.append(c)
                 if i != childidxs[-1]:
                     parent = c
@@ -260,9 +449,30 @@ class Interpreter:
                                                    f'Expected assignment operator, got {op_tok}')
                     )
 
+            Struct.unshare()
             if parent.type == 'MAP':
-                parent.elements[childidxs[-1]] = value
+                try: parent.elements[childidxs[-1]] = value
+                except TypeError: return res.failure(self.key_error(childidxs[-1], node, context))
+            elif parent.type == 'ARR':
+                error = parent.replace(childidxs[-1], value)
+                if error: return res.failure(error)
             else:
+                # c is the variable itself when the target isn't a container
+                bare = c is parents[0]
+                if bare and c.constvar:
+                    return res.failure(
+                        ConstantViolationError(node.pos_start,
+                                               node.pos_end,
+                                               f'Cannot change value of constant variable {name}')
+                    )
+                # a frozen element may be shared, so the container gets its own
+                if c.frozen:
+                    c = c.copy()
+                    owner, key = parents[-2], childidxs[-1]
+                    if bare: context.symbol_table.set(name, c)
+                    elif isinstance(owner, Struct): owner.context.symbol_table.set(key.value, c)
+                    elif isinstance(owner, List):
+                        owner.elements[key.value if isinstance(key, Value) else key] = c
                 c.value = value.value
 
         # iterate back through chain of parents to update their local symbol tables
@@ -278,6 +488,7 @@ class Interpreter:
 
         if isinstance(curr_node, ReferenceAssignNode):
             source = res.register(self.visit(curr_node, context))
+            if res.error: return res
             return res.success(source)
 
     def visit_VarAssignNode(self, node, context):
@@ -292,12 +503,18 @@ class Interpreter:
                                       f'Cannot overwrite keyword {var_name}.')
             )
 
-        # value is the new value for the variable
-        value = res.register(self.visit(node.value_node, context))
-        if res.should_return(): return res
+        # value is the new value for the variable; a frozen one is shared with
+        # the constant it was read from, and gets flagged below
+        try: value = self.value_of(node.value_node, context)
+        except Signal as signal: return signal.result
+        if value.frozen: value = value.copy()
 
         # og_val is the current variable if it exists
-        og_val = context.symbol_table.get(var_name)
+        table = context.symbol_table
+        if node.layout is not None and node.layout is table.layout:
+            og_val = table.frame[node.slot]
+            if og_val is None: og_val = table.get(var_name)
+        else: og_val = table.get(var_name)
         static_mode = context.symbol_table.get('static-typing').is_true()
 
         # handle new variable assignment
@@ -308,6 +525,7 @@ class Interpreter:
             if node.statictype not in ['var', 'default']:
                 if value.type.lower() != node.statictype:
                     if isinstance(value, Number):
+                        Struct.unshare()
                         if node.statictype == 'int':
                             value.value = int(value.value)
                             value.type = 'INT'
@@ -336,7 +554,9 @@ class Interpreter:
                 else: value.static = False
 
             # if const keyword is used, set new value to constant
-            if node.constvar: value.constvar = True
+            if node.constvar:
+                value.constvar = True
+                value = value.freeze()
 
             # can only use bare assignment to create new value
             if op_tok == '=':
@@ -350,7 +570,14 @@ class Interpreter:
                 if node.globalvar:
                     curr = context
                     while curr.parent: curr = curr.parent
-                    curr.symbol_table.globals.append(var_name)
+                    existing = curr.symbol_table.get_local(var_name)
+                    if existing is not None and existing.constvar:
+                        return res.failure(
+                            ConstantViolationError(node.pos_start,
+                                                   node.pos_end,
+                                                   f'Cannot change value of constant variable {var_name}')
+                        )
+                    curr.symbol_table.share(var_name)
                     curr.symbol_table.set(var_name, value)
 
                 context.symbol_table.set(var_name, value)
@@ -384,6 +611,7 @@ class Interpreter:
             if og_val.static:
                 if value.type != og_val.type:
                     if isinstance(value, Number):
+                        Struct.unshare()
                         if og_val.type == 'INT':
                             value.value = int(value.value)
                             value.type = 'INT'
@@ -474,12 +702,64 @@ class Interpreter:
 
         return res.success(value)
 
+    # fused `x += c` / `x = x + c`, valid while x holds a plain number that is not
+    # constant, has no triggers, and needs no static conversion
+    def visit_StepAssignNode(self, node, context):
+        table = context.symbol_table
+        if node.layout is not None and node.layout is table.layout:
+            og_val = table.frame[node.slot]
+            if og_val is None: og_val = table.get(node.var_name_tok.value)
+        else: og_val = table.get(node.var_name_tok.value)
+
+        if (og_val.__class__ is not Number or og_val.constvar or og_val.triggers or
+                (og_val.static and og_val.type != node.step_type) or
+                (not node.in_place and context.display_name.startswith('struct'))):
+            return self.visit_VarAssignNode(node, context)
+
+        value = Number(node.step_op(og_val.value, node.step_value))
+        value.static = og_val.static
+        value.triggers = og_val.triggers
+        if node.in_place:
+            value.set_pos(og_val.pos_start, og_val.pos_end).set_context(og_val.context)
+        else:
+            left = node.value_node.left_node
+            value.set_pos(left.pos_start, left.pos_end).set_context(context)
+
+        if node.layout is not None and node.layout is table.layout:
+            table.frame[node.slot] = value
+        else: table.set(node.var_name_tok.value, value)
+        return RuntimeResult().success(value)
+
+    # fused `name @ i` on a list, reading the element without copying the list
+    def visit_IndexNode(self, node, context):
+        if not context.display_name.startswith('struct'):
+            seq = self.lookup(node.left_node, context)
+            if isinstance(node.right_node, NumberNode): idx = node.right_node.tok.value
+            else:
+                idx = self.lookup(node.right_node, context)
+                idx = idx.value if isinstance(idx, Number) and idx.type == 'INT' else None
+            if (seq.__class__ is List and idx.__class__ is int and
+                    -len(seq.elements) <= idx < len(seq.elements)):
+                return RuntimeResult().success(seq.elements[idx])
+        return self.visit_BinOpNode(node, context)
+
+    @staticmethod
+    def lookup(node, context):
+        # stored value for a variable read, without the copy VarAccess makes
+        table = context.symbol_table
+        if node.layout is not None and node.layout is table.layout:
+            value = table.frame[node.slot]
+            if value is not None: return value
+        elif node.outer is not None and node.outer is table.layout and not table.symbols:
+            return table.enclosing(node.var_name_tok.value)
+        return table.get(node.var_name_tok.value)
+
     def visit_IfNode(self, node, context):
         res = RuntimeResult()
 
         for condition, expr, ret in node.cases:
-            condition_value = res.register(self.visit(condition, context))
-            if res.should_return(): return res
+            try: condition_value = self.value_of(condition, context)
+            except Signal as signal: return signal.result
 
             if condition_value.is_true():
                 expr_value = res.register(self.visit(expr, context))
@@ -493,6 +773,32 @@ class Interpreter:
 
         return res.success(None)
 
+    # fused if/? testing numeric comparisons on raw values
+    def visit_CompareBranchNode(self, node, context):
+        res = RuntimeResult()
+        fast = not context.display_name.startswith('struct')
+
+        for (condition, expr, ret), test in zip(node.cases, node.tests):
+            truth = None
+            if fast and test is not None:
+                try: truth = test(context) != 0
+                except (Deopt, ArithmeticError, TypeError): pass
+            if truth is None:
+                try: truth = self.value_of(condition, context).is_true()
+                except Signal as signal: return signal.result
+
+            if truth:
+                expr_value = res.register(self.visit(expr, context))
+                if res.should_return(): return res
+                return res.success(expr_value)
+
+        if node.else_case:
+            else_value = res.register(self.visit(node.else_case[0], context))
+            if res.should_return(): return res
+            return res.success(else_value)
+
+        return res.success(None)
+
     def visit_ForNode(self, node, context):
         res = RuntimeResult()
         elements = []
@@ -516,6 +822,8 @@ class Interpreter:
         else: condition = lambda: i > end_value.value
 
         while condition():
+            error = self.tick(node, context)
+            if error: return res.failure(error)
             context.symbol_table.set(node.var_name_tok.value, Number(i))
             i += step_value.value
 
@@ -526,7 +834,7 @@ class Interpreter:
             if res.loop_should_continue: continue
             if res.loop_should_break: break
 
-            elements.append(result)
+            if not node.discard: elements.append(result)
 
         return res.success(
             List(elements).set_context(context).set_pos(node.pos_start,
@@ -534,16 +842,24 @@ class Interpreter:
         )
 
     def visit_ForEachNode(self, node, context):
+        return self.foreach(node, context, node.body_node)
+
+    # fused foreach over a one-expression block; the result of each pass gets
+    # the same treatment the block would have given it
+    def visit_ForEachExprNode(self, node, context):
+        return self.foreach(node, context, node.body_expr, node.body_node)
+
+    def foreach(self, node, context, body, block=None):
+        # run body once per element of the container; block is the block a
+        # fused body was taken out of
         res = RuntimeResult()
         elements = []
 
         container = res.register(self.visit(node.container_node, context))
         if res.should_return(): return res
 
-        if isinstance(container, List) or isinstance(container, Map):
-            capsule = container.elements
-        elif isinstance(container, String):
-            capsule = container.value
+        if isinstance(container, (List, Array, Map, String, Iterator)):
+            capsule = container.iterate()
         else:
             return res.failure(
                 InvalidSyntaxError(node.pos_start,
@@ -551,19 +867,26 @@ class Interpreter:
                                    f'Expected container, got {type(container)}')
             )
 
-        for elem in capsule:
-            if isinstance(capsule, str):
-                elem = String(elem)
-            context.symbol_table.set(node.var_name_tok.value, elem)
-            result = res.register(self.visit(node.body_node, context))
-            if (res.should_return() and
-                    not res.loop_should_continue and
-                    not res.loop_should_break):
-                return res
-
-            if res.loop_should_continue: continue
-            if res.loop_should_break: break
-            elements.append(result)
+        var_name = node.var_name_tok.value
+        try:
+            for elem in capsule:
+                error = self.tick(node, context)
+                if error: return res.failure(error)
+                context.symbol_table.set(var_name, elem)
+                result = res.register(self.visit(body, context))
+                if (res.should_return() and
+                        not res.loop_should_continue and
+                        not res.loop_should_break):
+                    return res
+
+                if res.loop_should_continue: continue
+                if res.loop_should_break: break
+                if block is not None and not result.frozen:
+                    if not isinstance(result, Struct): result = result.set_context(context)
+                    result.set_pos(block.pos_start, block.pos_end)
+                if not node.discard: elements.append(result)
+        except IteratorError as e: return res.failure(e.error)
+        except RecursionError: return res.failure(self.depth_error(node, context))
 
         return res.success(
             List(elements).set_context(context).set_pos(node.pos_start,
@@ -575,8 +898,10 @@ class Interpreter:
 
         elements = []
         while True:
-            condition = res.register(self.visit(node.condition_node, context))
-            if res.should_return(): return res
+            error = self.tick(node, context)
+            if error: return res.failure(error)
+            try: condition = self.value_of(node.condition_node, context)
+            except Signal as signal: return signal.result
             if not condition.is_true(): break
 
             result = res.register(self.visit(node.body_node, context))
@@ -587,7 +912,7 @@ class Interpreter:
 
             if res.loop_should_continue: continue
             if res.loop_should_break: break
-            elements.append(result)
+            if not node.discard: elements.append(result)
 
         return res.success(
             List(elements).set_context(context).set_pos(node.pos_start,
@@ -606,8 +931,16 @@ class Interpreter:
                                     f'Variable {node.target} does not exist')
             )
 
-        # when triggers can currently only be added to named variables
-        context.symbol_table.symbols[node.target].triggers.append(node)
+        # when triggers can currently only be added to named variables, and a
+        # frozen value is shared, so its binding gets a value of its own
+        target = context.symbol_table.get_local(node.target)
+        if target.frozen:
+            copy = target.copy()
+            copy.type = target.type
+            context.symbol_table.set(node.target, copy)
+            target = copy
+        if not isinstance(target.triggers, list): target.triggers = []
+        target.triggers.append(node)
 
         return res.success(
             List(elements).set_context(context).set_pos(node.pos_start,
@@ -618,11 +951,25 @@ class Interpreter:
         res = RuntimeResult()
 
         name = node.name.value
-        if name not in context.symbol_table.symbols:
+        value = context.symbol_table.get_local(name)
+        # built-ins live in the namespace every program shares
+        if value is None and isinstance(context.symbol_table.get(name), BuiltInFunction):
+            return res.failure(
+                BuiltinViolationError(node.pos_start,
+                                      node.pos_end,
+                                      f'Cannot delete built-in function {name}.')
+            )
+        elif value is None:
             return res.failure(
                 VariableAccessError(node.pos_start,
                                     node.pos_end,
-                                    f'Variable {node.target} does not exist')
+                                    f'Variable {name} does not exist')
+            )
+        elif value.constvar:
+            return res.failure(
+                ConstantViolationError(node.pos_start,
+                                       node.pos_end,
+                                       f'Cannot delete constant variable {name}')
             )
         else: context.symbol_table.remove(name)
 
@@ -645,6 +992,122 @@ class Interpreter:
         else: val = Number.null
         return res.success_return(val)
 
+    # yields are only reached through resume() while a generator runs
+    def visit_YieldNode(self, node, context):
+        return RuntimeResult().failure(
+            RuntimeError(node.pos_start,
+                         node.pos_end,
+                         "'yield' is only allowed in the blocks, branches and loops of a function",
+                         context)
+        )
+
+    # generator frames: each resume_* method is a Python generator that runs its
+    # node like the matching visit_* method, passing up every value a yield in
+    # it produces, and returns the node's RuntimeResult once it finishes
+    def resume(self, node, context):
+        method = getattr(self, f'resume_{type(node).__name__}', None) if node.yields else None
+        if method is None: return self.visit(node, context)
+        return (yield from method(node, context))
+
+    def resume_CapsuleNode(self, node, context):
+        for el in node.plan or self.arrange(node):
+            res = yield from self.resume(el, context)
+            if res.should_return(): return res
+        return RuntimeResult().success(Number.null)
+
+    def resume_IfNode(self, node, context):
+        for condition, expr, ret in node.cases:
+            res = self.visit(condition, context)
+            if res.should_return(): return res
+            if res.value.is_true(): return (yield from self.resume(expr, context))
+
+        if node.else_case: return (yield from self.resume(node.else_case[0], context))
+        return RuntimeResult().success(Number.null)
+
+    resume_CompareBranchNode = resume_IfNode
+
+    def resume_ForNode(self, node, context):
+        res = RuntimeResult()
+
+        start_value = res.register(self.visit(node.start_value_node, context))
+        if res.should_return(): return res
+
+        end_value = res.register(self.visit(node.end_value_node, context))
+        if res.should_return(): return res
+
+        if node.step_value_node:
+            step_value = res.register(self.visit(node.step_value_node, context))
+            if res.should_return(): return res
+        else:
+            if start_value.value < end_value.value: step_value = Number(1)
+            else: step_value = Number(-1)
+
+        i = start_value.value
+        while i < end_value.value if step_value.value >= 0 else i > end_value.value:
+            error = self.tick(node, context)
+            if error: return RuntimeResult().failure(error)
+            context.symbol_table.set(node.var_name_tok.value, Number(i))
+            i += step_value.value
+
+            res = yield from self.resume(node.body_node, context)
+            if (res.should_return() and
+                    not res.loop_should_continue and
+                    not res.loop_should_break): return res
+            if res.loop_should_break: break
+
+        return RuntimeResult().success(Number.null)
+
+    def resume_ForEachNode(self, node, context):
+        res = self.visit(node.container_node, context)
+        if res.should_return(): return res
+
+        container = res.value
+        if not isinstance(container, (List, Array, Map, String, Iterator)):
+            return RuntimeResult().failure(
+                InvalidSyntaxError(node.pos_start,
+                                   node.pos_end,
+                                   f'Expected container, got {type(container)}')
+            )
+
+        try:
+            for elem in container.iterate():
+                error = self.tick(node, context)
+                if error: return RuntimeResult().failure(error)
+                context.symbol_table.set(node.var_name_tok.value, elem)
+                res = yield from self.resume(node.body_node, context)
+                if (res.should_return() and
+                        not res.loop_should_continue and
+                        not res.loop_should_break): return res
+                if res.loop_should_break: break
+        except IteratorError as e: return RuntimeResult().failure(e.error)
+        except RecursionError: return RuntimeResult().failure(self.depth_error(node, context))
+
+        return RuntimeResult().success(Number.null)
+
+    resume_ForEachExprNode = resume_ForEachNode
+
+    def resume_WhileNode(self, node, context):
+        while True:
+            error = self.tick(node, context)
+            if error: return RuntimeResult().failure(error)
+            res = self.visit(node.condition_node, context)
+            if res.should_return(): return res
+            if not res.value.is_true(): break
+
+            res = yield from self.resume(node.body_node, context)
+            if (res.should_return() and
+                    not res.loop_should_continue and
+                    not res.loop_should_break): return res
+            if res.loop_should_break: break
+
+        return RuntimeResult().success(Number.null)
+
+    def resume_YieldNode(self, node, context):
+        res = self.visit(node.value_node, context)
+        if res.should_return(): return res
+        yield res.value
+        return RuntimeResult().success(Number.null)
+
     def visit_UseNode(self, node, context):
         res = RuntimeResult()
 
@@ -696,8 +1159,10 @@ class Interpreter:
         arg_names = [a.value for a in node.arg_name_toks]
         func_val = Function(func_name, body_node,
                             arg_names,
-                            node.auto_return).set_context(context).set_pos(node.pos_start,
-                                                                           node.pos_end)
+                            node.auto_return,
+                            layout=node.layout,
+                            generator=node.generator).set_context(context).set_pos(node.pos_start,
+                                                                                   node.pos_end)
         if node.var_name_tok: context.symbol_table.set(func_name, func_val)
 
         return res.success(func_val)
@@ -706,47 +1171,49 @@ class Interpreter:
         res = RuntimeResult()
 
         args = []
-        value_to_call = res.register(self.visit(node.node_to_call, context))
-        if res.should_return(): return res
-        value_to_call = value_to_call.copy().set_pos(node.pos_start, node.pos_end)
-
-        # grab values for all input arguments
-        for i in range(len(node.arg_nodes)):
-            arg = res.register(self.visit(node.arg_nodes[i], context))
-            if res.error: return res
+        # struct arguments, and dotted ones that may reach into a struct, have
+        # their struct's properties refreshed after the call
+        refresh = False
+        try:
+            value_to_call = self.value_of(node.node_to_call, context)
+            # outside struct bodies a variable read already hands back a copy
+            if (node.node_to_call.__class__ is not VarAccessNode or value_to_call.frozen or
+                    context.display_name.startswith('struct')):
+                value_to_call = value_to_call.copy()
+            value_to_call.set_pos(node.pos_start, node.pos_end)
+
+            # grab values for all input arguments
+            for arg_node in node.arg_nodes:
+                arg = self.value_of(arg_node, context)
+                if isinstance(arg, Struct) or isinstance(arg_node, BinOpNode): refresh = True
 
-            # automatically append non-structs
-            if not isinstance(arg, Struct):
-                args.append(arg)
-                if res.should_return(): return res
-            else:
                 # check if struct has an interface for this function
                 # if so, call that and replace the struct argument with its proxy
-                if value_to_call.name not in arg.interfaces:
-                    args.append(arg)
-                    if res.should_return(): return res
-                else:
+                if isinstance(arg, Struct) and value_to_call.name in arg.interfaces:
                     func = arg.context.symbol_table.get(value_to_call.name)
-                    myval = res.register(self.visit(func.body_node, arg.context))
-                    if res.error: return res
-                    args.append(myval)
+                    proxy = self.visit(func.body_node, arg.context)
+                    if proxy.error: return proxy
+                    arg = proxy.value
+                args.append(arg)
+        except Signal as signal: return signal.result
+
+        # calls in tail position hand control back to the caller's Function.execute
+        # so that tail recursion runs in constant stack space
+        if (node.tail and context.trampoline and isinstance(value_to_call, Function)
+                and not value_to_call.generator
+                and not any(isinstance(arg, Struct) for arg in args)):
+            return res.success(TailCall(value_to_call, args))
 
         retval = res.register(value_to_call.execute(args, self))
         if res.should_return(): return res
 
         # update any chained symbol tables if needed
-        for i in range(len(node.arg_nodes)):
+        for i in range(len(node.arg_nodes) if refresh else 0):
             curr = node.arg_nodes[i]
             while isinstance(curr, BinOpNode):
-                if isinstance(curr.left_node, VarAccessNode):
-                    p = context.symbol_table.symbols[curr.left_node.var_name_tok.value]
-                    if isinstance(p, Struct):
-                        p.update_context()
-                        curr = None
-                elif isinstance(curr.left_node, BinOpNode): curr = curr.left_node
-                elif isinstance(curr.left_node, CallNode): curr = curr.left_node
+                curr = curr.left_node
             if isinstance(curr, VarAccessNode):
-                p = context.symbol_table.symbols[curr.var_name_tok.value]
+                p = context.symbol_table.get_local(curr.var_name_tok.value)
                 if isinstance(p, Struct): p.update_context()
 
         if isinstance(retval, Struct):
@@ -762,8 +1229,9 @@ class Interpreter:
         struct_val = StructGenerator(struct_name,
                                      body_node,
                                      arg_names,
-                                     node.auto_return).set_context(context).set_pos(node.pos_start,
-                                                                                    node.pos_end)
+                                     node.auto_return,
+                                     node.layout).set_context(context).set_pos(node.pos_start,
+                                                                               node.pos_end)
         if node.var_name_tok:
             context.symbol_table.set(struct_name, struct_val)
 
@@ -775,27 +1243,18 @@ class Interpreter:
         try_block = node.try_node
         catch_block = node.catch_node
         new_context = Context('<errorhandler>', context, node.pos_start, root=context.root)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
-
-        # prepare a symbol table for updated values
-        for s in context.symbol_table.symbols:
-            if s in context.symbol_table.globals: continue
-            new_context.symbol_table.symbols[s] = context.symbol_table.symbols[s]
+        table = new_context.symbol_table = LayeredSymbolTable(context.symbol_table)
 
-        # create a backup symbol table so that any changes made before an error was
-        # thrown in the try block will be restored before the catch block executes
-        restore = {key: val for key, val in new_context.symbol_table.symbols.items()}
+        # changes made before an error was thrown in the try block are undone
+        # before the catch block executes
         res.register(self.visit(try_block, new_context))
+        if isinstance(res.error, ResourceLimitError): return res
         if res.error:
-            for key, value in restore.items():
-                if key in new_context.symbol_table.symbols:
-                    new_context.symbol_table.symbols[key] = restore[key]
+            table.rollback()
             res.register(self.visit(catch_block, new_context))
             if res.error: return res
 
         # update symbol table
-        for key in new_context.symbol_table.symbols:
-            if key in context.symbol_table.symbols:
-                context.symbol_table.symbols[key] = new_context.symbol_table.symbols[key]
+        table.commit()
 
         return res.success(Number(0))
@@ -0,0 +1,116 @@
+# registry of the names every program starts out with
+
+from .typedef import SymbolTable
+from .datatypes import Number, BuiltInFunction
+
+
+# plain values bound in each program's own table, since programs may rebind them
+CONSTANTS = {'null': 0,
+             'T': 1,
+             'F': 0,
+             'static-typing': 0}
+
+# SAFyR name -> BuiltInFunction implementing it, by group; only the core group
+# is built up front, the others the first time a program reads one of their names
+GROUPS = {'core': {'print': 'print',
+                   'rprint': 'rprint',
+                   'isnum': 'is_number',
+                   'isstr': 'is_string',
+                   'islst': 'is_list',
+                   'isfun': 'is_function',
+                   'pop': 'pop',
+                   'append': 'append',
+                   'extend': 'extend',
+                   'keys': 'keys',
+                   'values': 'values',
+                   'range': 'range',
+                   'len': 'len',
+                   'type': 'type',
+                   'transform': 'transform',
+                   'filter': 'filter',
+                   'take': 'take',
+                   'zip': 'zip',
+                   'memo': 'memo',
+                   'memostats': 'memostats',
+                   'memoclear': 'memoclear'},
+          'console': {'INPUT': 'input',
+                      'INPUT_INT': 'input_int',
+                      'CLEAR': 'clear',
+                      'CLS': 'clear'},
+          'files': {'open': 'open',
+                    'read': 'read',
+                    'write': 'write',
+                    'close': 'close'},
+          'random': {'rand': 'rand'},
+          'arrays': {'array': 'array',
+                     'isarr': 'is_array',
+                     'sum': 'sum',
+                     'min': 'min',
+                     'max': 'max',
+                     'mean': 'mean'}}
+
+
+class BuiltinTable(SymbolTable):
+    """Read-only table of the built-in functions, shared by every program.
+
+    Every name is visible from the start, but the functions of a group other
+    than the core one are only created when one of its names is first read.
+
+    Parameters
+    ----------
+    groups : dict
+        Group name -> {SAFyR name: BuiltInFunction name}.
+    """
+    __slots__ = ('pending',)
+
+    def __init__(self, groups):
+        super().__init__()
+        self.pending = {}
+        for group, names in groups.items():
+            if group == 'core': self.load(names)
+            else:
+                for name in names: self.pending[name] = names
+        self.visible = set(self.symbols) | set(self.pending)
+
+    def load(self, names):
+        for name, method in names.items():
+            self.symbols[name] = BuiltInFunction(method)
+            self.pending.pop(name, None)
+
+    def get(self, name):
+        return self.get_local(name)
+
+    def get_local(self, name):
+        value = self.symbols.get(name)
+        if value is None and name in self.pending:
+            self.load(self.pending[name])
+            value = self.symbols[name]
+        return value
+
+    def items(self):
+        while self.pending: self.load(next(iter(self.pending.values())))
+        return self.symbols.items()
+
+    def set(self, name, value):
+        raise TypeError('the built-in namespace is read-only')
+
+    def remove(self, name):
+        raise TypeError('the built-in namespace is read-only')
+
+
+BUILTINS = BuiltinTable(GROUPS)
+
+
+def program_table():
+    """Return a new global symbol table for a program.
+
+    The table holds the program's own copies of the constants and sees
+    through to the shared built-in functions, which functions defined in the
+    program can see as well.
+    """
+    table = SymbolTable(BUILTINS)
+    for name, value in CONSTANTS.items(): table.set(name, Number(value))
+    # T and F can't be rebound, so every read of them can share one value
+    for name in ('T', 'F'): table.get(name).freeze()
+    table.globals = set(CONSTANTS) | BUILTINS.visible
+    return table
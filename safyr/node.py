@@ -10,11 +10,34 @@ class Node:
      - pos_end   : Position
          The position of the ending token.
     """
+    # names of the attributes holding child nodes, in source order
+    _fields = ()
+
+    # set by the resolver on every node of a generator body that contains a yield
+    yields = False
+
     def __init__(self, pos_start, pos_end):
 
         self.pos_start = pos_start
         self.pos_end   = pos_end
 
+    def children(self):
+        """Yield every child node in source order."""
+        for field in self._fields:
+            yield from _iter_nodes(getattr(self, field))
+
+
+def _iter_nodes(item):
+    # child fields can hold single nodes, lists, tuples (if cases) or dicts (maps)
+    if isinstance(item, Node):
+        yield item
+    elif isinstance(item, (list, tuple)):
+        for i in item: yield from _iter_nodes(i)
+    elif isinstance(item, dict):
+        for key, val in item.items():
+            yield from _iter_nodes(key)
+            yield from _iter_nodes(val)
+
 
 class NumberNode(Node):
     """Class representing numerical values.
@@ -26,6 +49,9 @@ class NumberNode(Node):
     :: ATTRS ::
     -- tok : Token (<~ INPUT)
     """
+    # frozen value the interpreter hands out for every evaluation
+    value = None
+
     def __init__(self, tok):
 
         super().__init__(tok.pos_start, tok.pos_end)
@@ -45,6 +71,9 @@ class StringNode(Node):
         :: ATTRS ::
         -- tok : Token (<~ INPUT)
         """
+    # frozen value the interpreter hands out for every evaluation
+    value = None
+
     def __init__(self, tok):
 
         super().__init__(tok.pos_start, tok.pos_end)
@@ -55,6 +84,12 @@ class StringNode(Node):
 
 
 class CapsuleNode(Node):
+    _fields = ('elements',)
+
+    # elements in the order they run, with defers and the return moved to
+    # the end; filled in by the interpreter the first time the block runs
+    plan = None
+
     def __init__(self,
                  element_nodes,
                  pos_start,
@@ -83,6 +118,8 @@ class MapNode(CapsuleNode):
 
 
 class ReferenceAssignNode(Node):
+    _fields = ('target_node', 'value_node')
+
     def __init__(self,
                  target_node,
                  op_tok,
@@ -96,6 +133,12 @@ class ReferenceAssignNode(Node):
 
 
 class VarAssignNode(Node):
+    _fields = ('value_node',)
+
+    # frame slot assigned by the resolver when the target is a function local
+    slot = None
+    layout = None
+
     def __init__(self,
                  var_name_tok,
                  op_tok,
@@ -118,6 +161,16 @@ class VarAssignNode(Node):
 
 
 class BinOpNode(Node):
+    _fields = ('left_node', 'right_node')
+
+    # inline cache for DOT reads: the struct layout last seen here and the
+    # slot the property occupies in it
+    ic_layout = None
+    ic_slot = None
+
+    # specialized closure for pure numeric expressions, False once ruled out
+    numeric = None
+
     def __init__(self,
                  left_node,
                  op_tok,
@@ -134,6 +187,8 @@ class BinOpNode(Node):
 
 
 class UnaryOpNode(Node):
+    _fields = ('node',)
+
     def __init__(self,
                  op_tok,
                  node):
@@ -148,6 +203,8 @@ class UnaryOpNode(Node):
 
 
 class IfNode(Node):
+    _fields = ('cases', 'else_case')
+
     def __init__(self,
                  cases,
                  else_case):
@@ -160,6 +217,11 @@ class IfNode(Node):
 
 
 class ForNode(Node):
+    _fields = ('start_value_node', 'end_value_node', 'step_value_node', 'body_node')
+
+    # set by the resolver when nothing reads the loop's list of results
+    discard = False
+
     def __init__(self,
                  var_name_tok,
                  start_value_node,
@@ -179,6 +241,11 @@ class ForNode(Node):
 
 
 class ForEachNode(Node):
+    _fields = ('container_node', 'body_node')
+
+    # set by the resolver when nothing reads the loop's list of results
+    discard = False
+
     def __init__(self,
                  var_name_tok,
                  container_node,
@@ -194,6 +261,8 @@ class ForEachNode(Node):
 
 
 class WhenNode(Node):
+    _fields = ('condition_node', 'body_node')
+
     def __init__(self,
                  condition_node,
                  body_node,
@@ -209,6 +278,11 @@ class WhenNode(Node):
 
 
 class WhileNode(Node):
+    _fields = ('condition_node', 'body_node')
+
+    # set by the resolver when nothing reads the loop's list of results
+    discard = False
+
     def __init__(self,
                  condition_node,
                  body_node,
@@ -222,6 +296,8 @@ class WhileNode(Node):
         
 
 class InterfaceDefinitionNode(Node):
+    _fields = ('body_node',)
+
     def __init__(self,
                  var_name_tok,
                  body_node,
@@ -235,6 +311,11 @@ class InterfaceDefinitionNode(Node):
 
 
 class StructDefinitionNode(Node):
+    _fields = ('body_node',)
+
+    # FrameLayout shared by every instance, filled in by the resolver
+    layout = None
+
     def __init__(self,
                  var_name_tok,
                  arg_name_toks,
@@ -258,6 +339,14 @@ class StructDefinitionNode(Node):
 
 
 class FunctionDefinitionNode(Node):
+    _fields = ('body_node',)
+
+    # FrameLayout for the body, filled in by the resolver
+    layout = None
+
+    # True if the body yields, making calls return an Iterator
+    generator = False
+
     def __init__(self,
                  var_name_tok,
                  arg_name_toks,
@@ -279,6 +368,8 @@ class FunctionDefinitionNode(Node):
 
 
 class ReturnNode(Node):
+    _fields = ('return_node',)
+
     def __init__(self,
                  return_node,
                  pos_start,
@@ -289,7 +380,25 @@ class ReturnNode(Node):
         self.return_node = return_node
 
 
+class YieldNode(Node):
+    _fields = ('value_node',)
+
+    def __init__(self,
+                 value_node,
+                 pos_start,
+                 pos_end):
+
+        super().__init__(pos_start, pos_end)
+
+        self.value_node = value_node
+
+
 class CallNode(Node):
+    _fields = ('node_to_call', 'arg_nodes')
+
+    # set by the resolver when the call's value is returned from its function
+    tail = False
+
     def __init__(self,
                  node_to_call,
                  arg_nodes):
@@ -318,6 +427,8 @@ class ErrorHandlerNode(Node):
     - auto_return : bool (optional)
 
     """
+    _fields = ('try_node', 'catch_node')
+
     def __init__(self,
                  try_tok,
                  try_node,
@@ -332,6 +443,14 @@ class ErrorHandlerNode(Node):
 
 
 class VarAccessNode(Node):
+    # frame slot assigned by the resolver when the name is a function local
+    slot = None
+    layout = None
+
+    # layout of the frame the read appears in when the name has no slot there,
+    # so it can only come from an enclosing scope
+    outer = None
+
     def __init__(self, var_name_tok):
         super().__init__(var_name_tok.pos_start, var_name_tok.pos_end)
         self.var_name_tok = var_name_tok
@@ -341,6 +460,8 @@ class VarAccessNode(Node):
 
 
 class ReferenceAccessNode(Node):
+    _fields = ('head',)
+
     def __init__(self, head):
         super().__init__(head.pos_start, head.pos_end)
         self.head = head
@@ -350,6 +471,8 @@ class ReferenceAccessNode(Node):
 
 
 class DeferNode(Node):
+    _fields = ('body_node',)
+
     def __init__(self,
                  body_node,
                  should_return_null):
@@ -1,6 +1,8 @@
 from .errors import *
 from .node import *
 from .result import ParseResult
+from .resolver import Resolver
+from .specialize import Fuser
 from .typedef import Token
 from . import constants as c
 
@@ -54,12 +56,17 @@ class Parser:
             return self.tokens[self.tok_idx + amt]
 
     # entry point for parsing
-    def parse(self):
+    # pass result_used=False when nothing reads the program's value, e.g. when a
+    # file is run rather than a line typed into the shell
+    def parse(self, result_used=True):
         res = self.statements()
         # check if there is still an error hanging out from inside the code
         # this makes sure any scopes still open at EOF throw an error
         if res.resid_err:
             return res.failure(res.resid_err)
+        if not res.error:
+            Resolver().resolve(res.node, result_used)
+            res.node = Fuser().rewrite(res.node)
         return res
 
     def statements(self):
@@ -139,6 +146,14 @@ class Parser:
                                           pos_start,
                                           self.current_tok.pos_start.copy()))
 
+        # yield keyword handler
+        if self.accept_keyword(res, 'yield'):
+            expr = res.register(self.expr())
+            if res.error: return res
+            return res.success(YieldNode(expr,
+                                         pos_start,
+                                         self.current_tok.pos_start.copy()))
+
         # del keyword handler
         if self.accept_keyword(res, 'del'):
             to_delete = self.expect_token_type(res, c.ID_SYM)
@@ -0,0 +1,257 @@
+# static analysis passes that annotate the AST once it has been parsed
+
+from .node import *
+
+
+class FrameLayout:
+    """Slot assignments for the local variables of one function body.
+
+    Parameters
+    ----------
+    names : list of str
+        Local names in the order their slots should be allocated.
+    """
+
+    # most call tables kept for reuse by calls of a function using this layout
+    max_pool = 32
+
+    def __init__(self, names=()):
+        self.slots = {}
+        for name in names: self.add(name)
+
+        # set by the resolver for function bodies where nothing that reads a
+        # call's table, a function or struct defined in it, outlives the call
+        self.closed = False
+        self.pool = []
+
+    def release(self, context):
+        """Return a finished call's table to the pool if nothing else can
+        read it.
+
+        The context itself is never reused: values made during the call keep
+        pointing at it, and tracebacks from errors on them walk its parents.
+        """
+        table = context.symbol_table
+        if not self.closed or table.symbols or table.globals: return
+        if len(self.pool) >= self.max_pool: return
+        table.frame[:] = (None,) * len(table.frame)
+        table.parent = None
+        table.resolved.clear()
+        self.pool.append(table)
+
+    def add(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+    @property
+    def size(self):
+        return len(self.slots)
+
+    def __repr__(self):
+        return f'<layout {list(self.slots)}>'
+
+
+class Resolver:
+    """Assigns frame slots to the locals of every function and struct definition.
+
+    A function gets a FrameLayout holding its arguments, its own name and every
+    name it assigns or loops over.  Reads and writes of those names inside the
+    function's own scope are annotated with their slot so the interpreter can
+    index the call frame directly, and reads of any other name are marked as
+    coming from an enclosing scope.  Struct bodies get a layout of their own the
+    same way, which every instance of the struct shares, and interface bodies
+    use the layout of the struct they are defined in.  `when` trigger bodies
+    and nested definitions are not part of the enclosing scope, since they may
+    run against another context.  Code inside a `try`
+    block runs against a layer over the frame and takes the by-name path.
+
+    Calls whose value is returned straight out of a function are marked as
+    tail calls so the interpreter can run them without nesting a new frame.
+    Loops in statement position are marked so they don't collect the results
+    of their iterations, and functions that yield are marked as generators.
+    A function whose calls' contexts can't escape the call, through a struct
+    or function it defines, an import or a yield, has its layout marked
+    closed so those contexts can be pooled.
+    """
+
+    def resolve(self, node, result_used=True):
+        # True while walking code whose `return` leaves a function call directly
+        self.in_function = False
+        if not result_used: self.discard(node)
+        self.visit(node, None)
+        return node
+
+    def visit(self, node, layout):
+        method = getattr(self, f'visit_{type(node).__name__}', self.generic_visit)
+        method(node, layout)
+
+    def generic_visit(self, node, layout):
+        for child in node.children():
+            self.visit(child, layout)
+
+    def visit_VarAccessNode(self, node, layout):
+        self.bind(node, node.var_name_tok.value, layout)
+        if layout is not None and node.slot is None: node.outer = layout
+
+    def visit_VarAssignNode(self, node, layout):
+        self.bind(node, node.var_name_tok.value, layout)
+        self.visit(node.value_node, layout)
+
+    def visit_ReturnNode(self, node, layout):
+        if self.in_function and isinstance(node.return_node, CallNode):
+            node.return_node.tail = True
+        self.generic_visit(node, layout)
+
+    # trigger bodies run in whichever context later assigns the target
+    def visit_WhenNode(self, node, layout):
+        self.discard(node.body_node)
+        self.visit_outside_function(node, None)
+
+    # struct bodies build the table that becomes the instance, so their layout
+    # is the shape every instance of the struct shares
+    def visit_StructDefinitionNode(self, node, layout):
+        names = [a.value for a in node.arg_name_toks]
+        self.collect(node.body_node, names)
+        node.layout = FrameLayout(names)
+        self.discard(node.body_node)
+        self.visit_outside_function(node, node.layout)
+
+    # interface bodies are evaluated inside the struct's context, so they
+    # share the struct's layout
+    def visit_InterfaceDefinitionNode(self, node, layout):
+        if not node.auto_return: self.discard(node.body_node)
+        self.visit_outside_function(node, layout)
+
+    # the error handler has to see a call's failure, so nothing in it is a tail call
+    def visit_ErrorHandlerNode(self, node, layout):
+        self.discard(node.try_node)
+        self.discard(node.catch_node)
+        self.visit_outside_function(node, layout)
+
+    def visit_FunctionDefinitionNode(self, node, layout):
+        names = [a.value for a in node.arg_name_toks]
+        if node.var_name_tok: names.append(node.var_name_tok.value)
+
+        self.collect(node.body_node, names)
+        node.layout = FrameLayout(names)
+        node.layout.closed = self.closed(node)
+        if node.auto_return and isinstance(node.body_node, CallNode):
+            node.body_node.tail = True
+        if not node.auto_return: self.discard(node.body_node)
+        node.generator = self.mark_yields(node.body_node)
+
+        outer, self.in_function = self.in_function, True
+        self.visit(node.body_node, node.layout)
+        self.in_function = outer
+
+    def visit_outside_function(self, node, layout):
+        outer, self.in_function = self.in_function, False
+        self.generic_visit(node, layout)
+        self.in_function = outer
+
+    @staticmethod
+    def bind(node, name, layout):
+        if layout is None: return
+        slot = layout.slots.get(name)
+        if slot is not None:
+            node.slot = slot
+            node.layout = layout
+
+    def mark_yields(self, node):
+        # flag the nodes on the way down to each yield in this function's body
+        if isinstance(node, (FunctionDefinitionNode, StructDefinitionNode,
+                             InterfaceDefinitionNode)):
+            return False
+        found = isinstance(node, YieldNode)
+        for child in node.children():
+            if self.mark_yields(child): found = True
+        if found: node.yields = True
+        return found
+
+    def closed(self, node):
+        # True if nothing in a function's body can hold on to its call's
+        # context once the call returns.  A function defined in the body does
+        # capture it, but one that is only ever called by name, and not from a
+        # tail position, can't be reached any more once the call is over
+        names = set()
+        if not self.contained(node.body_node, node.auto_return, names): return False
+        return self.only_called(node.body_node, names, node.auto_return)
+
+    def contained(self, node, used, names):
+        # False if this scope imports, yields, defines a struct, or defines a
+        # function whose value is used or whose own calls aren't closed;
+        # collects the names of the functions it does define.  used is True
+        # where the value of node can end up anywhere but a discarded statement
+        if isinstance(node, (UseNode, YieldNode, StructDefinitionNode, InterfaceDefinitionNode)):
+            return False
+        if isinstance(node, FunctionDefinitionNode):
+            if used or node.var_name_tok is None or not self.closed(node): return False
+            names.add(node.var_name_tok.value)
+            return True
+        # trigger bodies run against whichever context assigns the target
+        if isinstance(node, WhenNode): return not self.defines(node.body_node)
+
+        if type(node) is CapsuleNode:
+            parts = [(el, used) for el in node.elements]
+        elif isinstance(node, IfNode):
+            parts = [(condition, True) for condition, expr, ret in node.cases]
+            parts += [(expr, used) for condition, expr, ret in node.cases]
+            if node.else_case: parts.append((node.else_case[0], used))
+        elif isinstance(node, (ForNode, ForEachNode, WhileNode, DeferNode)):
+            parts = [(child, used or child is not node.body_node) for child in node.children()]
+        elif isinstance(node, ErrorHandlerNode):
+            parts = [(child, False) for child in node.children()]
+        else:
+            parts = [(child, True) for child in node.children()]
+        return all(self.contained(child, child_used, names) for child, child_used in parts)
+
+    def defines(self, node):
+        # True if anything under node defines, imports or yields
+        if isinstance(node, (FunctionDefinitionNode, StructDefinitionNode,
+                             InterfaceDefinitionNode, UseNode, YieldNode)):
+            return True
+        return any(self.defines(child) for child in node.children())
+
+    def only_called(self, node, names, tail=False):
+        # True if every read of one of names under node is the callee of a
+        # call outside tail position, which runs before the caller returns
+        if not names: return True
+        if isinstance(node, VarAccessNode): return node.var_name_tok.value not in names
+        if isinstance(node, CallNode) and isinstance(node.node_to_call, VarAccessNode):
+            if tail and node.node_to_call.var_name_tok.value in names: return False
+            return all(self.only_called(arg, names) for arg in node.arg_nodes)
+        tail = (isinstance(node, ReturnNode) or
+                (isinstance(node, FunctionDefinitionNode) and node.auto_return))
+        return all(self.only_called(child, names, tail) for child in node.children())
+
+    def discard(self, node):
+        # node's value is never read, so neither is the value of any statement
+        # it is made of
+        if type(node) is CapsuleNode:
+            for el in node.elements: self.discard(el)
+        elif isinstance(node, (ForNode, ForEachNode, WhileNode)):
+            node.discard = True
+            self.discard(node.body_node)
+        elif isinstance(node, IfNode):
+            for condition, expr, ret in node.cases: self.discard(expr)
+            if node.else_case: self.discard(node.else_case[0])
+        elif isinstance(node, DeferNode):
+            self.discard(node.body_node)
+
+    def collect(self, node, names):
+        # gather the names bound in this scope
+        if isinstance(node, (FunctionDefinitionNode, StructDefinitionNode,
+                             InterfaceDefinitionNode)):
+            if node.var_name_tok: names.append(node.var_name_tok.value)
+            return
+        if isinstance(node, WhenNode):
+            return
+
+        if isinstance(node, VarAssignNode) and not node.globalvar:
+            names.append(node.var_name_tok.value)
+        elif isinstance(node, (ForNode, ForEachNode)):
+            names.append(node.var_name_tok.value)
+
+        for child in node.children():
+            self.collect(child, names)
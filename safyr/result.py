@@ -1,13 +1,3 @@
-from functools import wraps
-
-def with_reset(func):
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        self.reset()
-        return func(self, *args, **kwargs)
-    return wrapper
-
-
 class LexResult:
     def __init__(self):
         self.error = None
@@ -66,9 +56,17 @@ class ParseResult:
 
 
 class RuntimeResult:
+    # every node visit creates one of these, so keep it lean: fixed slots and
+    # each outcome written out in full rather than going through reset()
+    __slots__ = ('value', 'error', 'func_return_value',
+                 'loop_should_continue', 'loop_should_break')
 
     def __init__(self):
-        self.reset()
+        self.value = None
+        self.error = None
+        self.func_return_value = None
+        self.loop_should_continue = False
+        self.loop_should_break = False
 
     def reset(self):
         self.value = None
@@ -84,29 +82,44 @@ class RuntimeResult:
         self.loop_should_break = res.loop_should_break
         return res.value
 
-    @with_reset
     def success(self, value):
         self.value = value
+        self.error = None
+        self.func_return_value = None
+        self.loop_should_continue = False
+        self.loop_should_break = False
         return self
 
-    @with_reset
     def success_return(self, value):
+        self.value = None
+        self.error = None
         self.func_return_value = value
+        self.loop_should_continue = False
+        self.loop_should_break = False
         return self
 
-    @with_reset
     def success_continue(self):
+        self.value = None
+        self.error = None
+        self.func_return_value = None
         self.loop_should_continue = True
+        self.loop_should_break = False
         return self
 
-    @with_reset
     def success_break(self):
+        self.value = None
+        self.error = None
+        self.func_return_value = None
+        self.loop_should_continue = False
         self.loop_should_break = True
         return self
 
-    @with_reset
     def failure(self, error):
+        self.value = None
         self.error = error
+        self.func_return_value = None
+        self.loop_should_continue = False
+        self.loop_should_break = False
         return self
 
     def should_return(self):
@@ -115,3 +128,20 @@ class RuntimeResult:
                 self.func_return_value or
                 self.loop_should_continue or
                 self.loop_should_break)
+
+
+class Signal(Exception):
+    """Raised by the interpreter's value_* methods when evaluation stops early.
+
+    Expressions are evaluated to raw values on the normal path; an error, a
+    return, a break or a continue is the exceptional case and travels up as a
+    Signal until a visit_* method turns it back into a RuntimeResult.
+
+    Parameters
+    ----------
+    result : RuntimeResult
+        The result that stopped evaluation.
+    """
+
+    def __init__(self, result):
+        self.result = result
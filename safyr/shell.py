@@ -1,4 +1,5 @@
 from .interpreter import *
+from .library import program_table
 
 
 def help():
@@ -18,38 +19,10 @@ class Shell:
         self.run()
 
     def run(self):
-        global_symbol_table = SymbolTable()
-        global_symbol_table.set("null", Number(0))
-        global_symbol_table.set("T", Number(1))
-        global_symbol_table.set("F", Number(0))
-        global_symbol_table.set('static-typing', Number(0))
-        global_symbol_table.set("print", BuiltInFunction.print)
-        global_symbol_table.set("rprint", BuiltInFunction.rprint)
-        global_symbol_table.set("INPUT", BuiltInFunction.input)
-        global_symbol_table.set("INPUT_INT", BuiltInFunction.input_int)
-        global_symbol_table.set("CLEAR", BuiltInFunction.clear)
-        global_symbol_table.set("CLS", BuiltInFunction.clear)
-        global_symbol_table.set("isnum", BuiltInFunction.is_number)
-        global_symbol_table.set("isstr", BuiltInFunction.is_string)
-        global_symbol_table.set("islst", BuiltInFunction.is_list)
-        global_symbol_table.set("isfun", BuiltInFunction.is_function)
-        global_symbol_table.set("pop", BuiltInFunction.pop)
-        global_symbol_table.set("append", BuiltInFunction.append)
-        global_symbol_table.set("extend", BuiltInFunction.extend)
-        global_symbol_table.set("keys", BuiltInFunction.keys)
-        global_symbol_table.set("values", BuiltInFunction.values)
-        global_symbol_table.set("open", BuiltInFunction.open)
-        global_symbol_table.set("read", BuiltInFunction.read)
-        global_symbol_table.set("write", BuiltInFunction.write)
-        global_symbol_table.set("close", BuiltInFunction.close)
-        global_symbol_table.set("range", BuiltInFunction.range)
-        global_symbol_table.set("rand", BuiltInFunction.rand)
-        global_symbol_table.set("len", BuiltInFunction.len)
-        global_symbol_table.set("type", BuiltInFunction.type)
+        global_symbol_table = program_table()
 
         context = Context('<program>', root=os.getcwd())
         context.symbol_table = global_symbol_table
-        context.symbol_table.globals = list(global_symbol_table.symbols.keys())
 
         while True:
 
@@ -82,7 +55,7 @@ class Shell:
                     continue
 
                 par = Parser(toks.value, global_symbol_table)
-                ast = par.parse()
+                ast = par.parse(result_used=not fromfile)
                 if ast.error:
                     print(f'Exception encountered in parser:\n\t{ast.error}')
                     continue
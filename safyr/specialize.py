@@ -0,0 +1,296 @@
+# specialized execution paths for hot node patterns
+
+import operator
+
+from .node import *
+from .typedef import SymbolTable
+from .datatypes import Number
+from .constants import KWDS
+
+
+ARITHMETIC = {'PLS': operator.add,
+              'MNS': operator.sub,
+              'MUL': operator.mul,
+              'DIV': operator.truediv,
+              'MOD': operator.mod,
+              'POW': operator.pow}
+
+COMPARISON = {'EQ': operator.eq,
+              'NE': operator.ne,
+              'LT': operator.lt,
+              'GT': operator.gt,
+              'LE': operator.le,
+              'GE': operator.ge}
+
+
+class Deopt(Exception):
+    """Raised by a specialized closure when its operands are not plain numbers.
+
+    The specialized subtrees have no side effects, so the interpreter simply
+    evaluates the node again on the generic path, which reports any error.
+    """
+
+
+def numeric_closure(node):
+    """Compile a pure numeric BinOpNode into a closure over raw Python values.
+
+    Parameters
+    ----------
+    node : BinOpNode
+        Root of the expression.  Every node under it must be a number literal,
+        a variable read, unary minus or not, or an arithmetic or comparison
+        operator.
+
+    Returns
+    -------
+    function or None
+        ``run(context)`` evaluating the expression with primitive int/float
+        operations and boxing only the final result into a Number, or None if
+        the expression cannot be specialized.
+    """
+    compute = raw_closure(node)
+    if compute is None: return None
+
+    # tests give the shared truth values, just as the generic path does
+    if ((isinstance(node, BinOpNode) and node.op_tok.type in COMPARISON) or
+            (isinstance(node, UnaryOpNode) and node.op_tok.type == 'NOT')):
+        return lambda context: Number.truth(compute(context))
+
+    # the boxed result carries whatever Number.copy would have carried down the
+    # left spine of the expression: position, static/const flags and triggers
+    pos_start = pos_end = None
+    pos_set = False
+    source = None
+    curr = node
+    while True:
+        if isinstance(curr, UnaryOpNode):
+            if not pos_set: pos_start, pos_end, pos_set = curr.pos_start, curr.pos_end, True
+            if curr.op_tok.type == 'NOT': break
+            curr = curr.node
+        elif isinstance(curr, BinOpNode):
+            if curr.op_tok.type in COMPARISON:
+                if not pos_set: pos_start, pos_end = curr.pos_start, curr.pos_end
+                break
+            curr = curr.left_node
+        else:
+            if not pos_set: pos_start, pos_end = curr.pos_start, curr.pos_end
+            if isinstance(curr, VarAccessNode): source = load_closure(curr)
+            break
+
+    def run(context):
+        value = compute(context)
+        ret = Number(value)
+        if source is not None:
+            src = source(context)
+            ret.static = src.static
+            ret.constvar = src.constvar
+            ret.triggers = src.triggers
+        ret.pos_start = pos_start
+        ret.pos_end = pos_end
+        ret.context = context
+        return ret
+
+    return run
+
+
+def raw_closure(node):
+    # returns a closure computing the raw value of node, or None
+    if isinstance(node, NumberNode):
+        value = node.tok.value
+        return lambda context: value
+
+    if isinstance(node, VarAccessNode):
+        load = load_closure(node)
+        return lambda context: load(context).value
+
+    if isinstance(node, UnaryOpNode):
+        operand = raw_closure(node.node)
+        if operand is None: return None
+        if node.op_tok.type == 'MNS': return lambda context: operand(context) * -1
+        if node.op_tok.type == 'NOT': return lambda context: 1 if operand(context) == 0 else 0
+        return None
+
+    if not isinstance(node, BinOpNode): return None
+    left = raw_closure(node.left_node)
+    right = raw_closure(node.right_node)
+    if left is None or right is None: return None
+
+    op = node.op_tok.type
+    if op in ('DIV', 'MOD'):
+        # let the generic path raise the division error
+        fn = ARITHMETIC[op]
+        def divide(context):
+            lhs = left(context)
+            rhs = right(context)
+            if rhs == 0: raise Deopt
+            return fn(lhs, rhs)
+        return divide
+
+    if op in ARITHMETIC:
+        fn = ARITHMETIC[op]
+        return lambda context: fn(left(context), right(context))
+
+    if op in COMPARISON:
+        fn = COMPARISON[op]
+        return lambda context: int(fn(left(context), right(context)))
+
+    return None
+
+
+def load_closure(node):
+    # returns a closure fetching the stored Number a variable read refers to
+    name = node.var_name_tok.value
+    layout = node.layout
+    slot = node.slot
+    outer = node.outer
+    inlined = inlined_value = None
+
+    def load(context):
+        nonlocal inlined, inlined_value
+        table = context.symbol_table
+        if table is inlined: return inlined_value
+        if layout is not None and table.layout is layout:
+            value = table.frame[slot]
+            if value is None: value = table.get(name)
+        elif outer is not None and table.layout is outer and not table.symbols:
+            value = table.enclosing(name)
+        else: value = table.get(name)
+        if value.__class__ is not Number: raise Deopt
+
+        # a constant can be neither rebound nor deleted, so once it is found in
+        # a plain table of its own the site can keep reading it from here
+        if (value.frozen and value.constvar and table.__class__ is SymbolTable and
+                table.symbols.get(name) is value):
+            inlined, inlined_value = table, value
+        return value
+
+    return load
+
+
+class StepAssignNode(VarAssignNode):
+    """Fused `x += c`, `x -= c`, `x = x + c` and `x = x - c` on a number.
+
+    Attributes
+    ----------
+    step_op : function
+        operator.add or operator.sub.
+    step_value : int or float
+        The constant c.
+    step_type : str
+        Type the existing value must have when it is static.
+    in_place : bool
+        True for the augmented forms, whose result keeps the old value's
+        position and context.
+    """
+
+
+class IndexNode(BinOpNode):
+    """Fused `name @ i` where i is a variable or an integer literal."""
+
+
+class ForEachExprNode(ForEachNode):
+    """Fused foreach whose block holds a single expression.
+
+    Attributes
+    ----------
+    body_expr : Node
+        The only element of the block, visited without the block around it.
+    """
+
+
+class CompareBranchNode(IfNode):
+    """Fused if/? whose conditions are numeric comparisons.
+
+    Attributes
+    ----------
+    tests : list
+        Raw closure for each case's condition, or None for a case that has
+        to be evaluated normally.
+    """
+
+
+def fuse(cls, node, **attrs):
+    # build a fused node carrying over everything the original node knew
+    fused = cls.__new__(cls)
+    fused.__dict__.update(node.__dict__)
+    fused.__dict__.update(attrs)
+    return fused
+
+
+class Fuser:
+    """Replaces common idioms in a resolved AST with fused nodes.
+
+    Each fused node has its own visit method that handles the common case
+    directly and otherwise hands the node to the generic visit method of its
+    base class, so static typing, constants and `when` triggers still go
+    through the usual checks.
+    """
+
+    def rewrite(self, node):
+        # assignment targets are walked by the interpreter itself
+        fields = ('value_node',) if isinstance(node, ReferenceAssignNode) else node._fields
+        for field in fields:
+            setattr(node, field, self.rewrite_item(getattr(node, field)))
+        method = getattr(self, f'fuse_{type(node).__name__}', None)
+        return method(node) if method else node
+
+    def rewrite_item(self, item):
+        if isinstance(item, Node): return self.rewrite(item)
+        if isinstance(item, list):
+            item[:] = [self.rewrite_item(i) for i in item]
+            return item
+        if isinstance(item, tuple): return tuple(self.rewrite_item(i) for i in item)
+        if isinstance(item, dict):
+            return {self.rewrite_item(k): self.rewrite_item(v) for k, v in item.items()}
+        return item
+
+    @staticmethod
+    def fuse_VarAssignNode(node):
+        name = node.var_name_tok.value
+        if (node.constvar or node.globalvar or node.statictype != 'default' or
+                name in KWDS + ['T', 'F']): return node
+
+        value = node.value_node
+        op = node.op_tok.value
+        if op in ('+=', '-=') and isinstance(value, NumberNode):
+            return fuse(StepAssignNode, node,
+                        step_op=operator.add if op == '+=' else operator.sub,
+                        step_value=value.tok.value,
+                        step_type=value.tok.type,
+                        in_place=True)
+
+        if (op == '=' and type(value) is BinOpNode and value.op_tok.type in ('PLS', 'MNS') and
+                isinstance(value.left_node, VarAccessNode) and
+                value.left_node.var_name_tok.value == name and
+                isinstance(value.right_node, NumberNode)):
+            return fuse(StepAssignNode, node,
+                        step_op=ARITHMETIC[value.op_tok.type],
+                        step_value=value.right_node.tok.value,
+                        step_type='INT',
+                        in_place=False)
+        return node
+
+    @staticmethod
+    def fuse_BinOpNode(node):
+        if (node.op_tok.type == 'AT' and isinstance(node.left_node, VarAccessNode) and
+                (isinstance(node.right_node, VarAccessNode) or
+                 (isinstance(node.right_node, NumberNode) and node.right_node.tok.type == 'INT'))):
+            return fuse(IndexNode, node)
+        return node
+
+    @staticmethod
+    def fuse_ForEachNode(node):
+        body = node.body_node
+        if (type(body) is CapsuleNode and len(body.elements) == 1 and
+                not isinstance(body.elements[0], (DeferNode, ReturnNode))):
+            return fuse(ForEachExprNode, node, body_expr=body.elements[0])
+        return node
+
+    @staticmethod
+    def fuse_IfNode(node):
+        tests = []
+        for condition, expr, ret in node.cases:
+            compare = isinstance(condition, BinOpNode) and condition.op_tok.type in COMPARISON
+            tests.append(raw_closure(condition) if compare else None)
+        if any(tests): return fuse(CompareBranchNode, node, tests=tests)
+        return node
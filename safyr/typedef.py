@@ -15,6 +15,8 @@ class Position:
     fn   :
     ftxt :
     """
+    __slots__ = ('idx', 'ln', 'col', 'fn', 'ftxt')
+
     def __init__(self, idx, ln, col, fn, ftxt):
         self.idx = idx
         self.ln = ln
@@ -44,7 +46,8 @@ class Token:
     _pos_start :
     _pos_end   :
     """
-    
+    __slots__ = ('type', 'value', 'pos_start', 'pos_end')
+
     def __init__(self, type_, value=None, pos_start=None, pos_end=None):
         self.type = type_
         self.value = value
@@ -74,31 +77,207 @@ class Token:
         return self.value == other.value and self.type == other.type
 
 class SymbolTable:
-    
+    __slots__ = ('symbols', 'parent', 'visible', 'resolved', 'seen')
+
+    # plain tables have no frame; see FrameSymbolTable
+    layout = None
+    frame = None
+
+    # bumped by any change that could move the table a name resolves to
+    # through the parent chain, which drops every table's `resolved` cache
+    epoch = 0
+
     def __init__(self, parent=None):
         self.symbols = {}
         self.parent = parent
-        self.globals = []
+        self.visible = set()
+        # ancestor table each name read through the parent chain was found in
+        self.resolved = {}
+        self.seen = SymbolTable.epoch
+
+    @property
+    def globals(self):
+        """Names child scopes can see through to this table."""
+        return self.visible
+
+    @globals.setter
+    def globals(self, names):
+        # hosts may hand over any iterable of names, e.g. a list
+        self.visible = set(names)
+        SymbolTable.epoch += 1
+
+    def share(self, name):
+        """Make `name` visible to child scopes."""
+        if name not in self.visible:
+            self.visible.add(name)
+            SymbolTable.epoch += 1
 
     def get(self, name):
-        value = self.symbols.get(name, None)
-        if value == None and self.parent:
-            if name in self.parent.globals:
-                return self.parent.get(name)
+        value = self.symbols.get(name)
+        if value is None and self.parent is not None:
+            return self.lookup(name)
         return value
 
+    def lookup(self, name):
+        # find a name this table doesn't bind by walking up through every
+        # parent that shares it, remembering which table held it
+        if self.seen != SymbolTable.epoch:
+            self.resolved.clear()
+            self.seen = SymbolTable.epoch
+        owner = self.resolved.get(name)
+        if owner is not None: return owner.get_local(name)
+
+        table = self
+        while table.parent is not None and name in table.parent.visible:
+            table = table.parent
+            value = table.get_local(name)
+            if value is not None:
+                self.resolved[name] = table
+                return value
+        return None
+
+    def get_local(self, name):
+        return self.symbols.get(name, None)
+
+    def enclosing(self, name):
+        # read a name this table is known not to bind
+        parent = self.parent
+        if parent is not None and name in parent.visible: return parent.get(name)
+        return None
+
+    def items(self):
+        return self.symbols.items()
+
     def set(self, name, value):
+        # a shared name bound here for the first time hides any table further
+        # up that child scopes may have cached
+        if name in self.visible and name not in self.symbols:
+            SymbolTable.epoch += 1
         self.symbols[name] = value
 
     def remove(self, name):
         del self.symbols[name]
+        SymbolTable.epoch += 1
+
+
+class FrameSymbolTable(SymbolTable):
+    """Symbol table for a function call whose locals were resolved to slots.
+
+    Names listed in the layout live in a preallocated list instead of the
+    `symbols` dict, and nodes annotated by the resolver index into it directly.
+    Any other name (e.g. one created by `use` inside the function) falls back to
+    the dict, so the by-name interface behaves exactly like SymbolTable.
+
+    Parameters
+    ----------
+    parent : SymbolTable
+    layout : FrameLayout
+    """
+    __slots__ = ('layout', 'slots', 'frame')
+
+    def __init__(self, parent, layout):
+        super().__init__(parent)
+        self.layout = layout
+        self.slots = layout.slots
+        self.frame = [None] * layout.size
+
+    def get(self, name):
+        idx = self.slots.get(name)
+        if idx is None: return super().get(name)
+        value = self.frame[idx]
+        if value is None and self.parent is not None:
+            return self.lookup(name)
+        return value
+
+    def get_local(self, name):
+        idx = self.slots.get(name)
+        if idx is None: return self.symbols.get(name, None)
+        return self.frame[idx]
+
+    def items(self):
+        bound = [(name, self.frame[idx]) for name, idx in self.slots.items()
+                 if self.frame[idx] is not None]
+        return bound + list(self.symbols.items())
+
+    def set(self, name, value):
+        idx = self.slots.get(name)
+        if idx is None: super().set(name, value)
+        else: self.frame[idx] = value
+
+    def remove(self, name):
+        idx = self.slots.get(name)
+        if idx is None: super().remove(name)
+        elif self.frame[idx] is None: raise KeyError(name)
+        else:
+            self.frame[idx] = None
+            SymbolTable.epoch += 1
+
+
+class LayeredSymbolTable(SymbolTable):
+    """Symbol table a `try` block runs in, laid over the enclosing scope's table.
+
+    Reads fall through to the table underneath until the block writes or
+    deletes a name, so opening the layer takes no copy of the scope, and
+    undoing or keeping the block's changes only visits the names it wrote.
+    Child scopes see through the layer to whatever they could see through the
+    table underneath.
+
+    Parameters
+    ----------
+    parent : SymbolTable
+        Table of the scope the block appears in.
+    """
+    __slots__ = ('deleted',)
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.visible = parent.visible
+        self.deleted = set()
+
+    def get(self, name):
+        value = self.symbols.get(name)
+        if value is None and name not in self.deleted: return self.parent.get(name)
+        return value
+
+    def get_local(self, name):
+        value = self.symbols.get(name)
+        if value is None and name not in self.deleted: return self.parent.get_local(name)
+        return value
+
+    def items(self):
+        below = [(name, value) for name, value in self.parent.items()
+                 if name not in self.symbols and name not in self.deleted]
+        return below + list(self.symbols.items())
+
+    def set(self, name, value):
+        self.deleted.discard(name)
+        self.symbols[name] = value
+
+    def remove(self, name):
+        if self.get_local(name) is None: raise KeyError(name)
+        self.symbols.pop(name, None)
+        self.deleted.add(name)
+
+    def rollback(self):
+        """Drop the block's writes to names the scope underneath already had."""
+        for name in [name for name in self.symbols if self.parent.get_local(name) is not None]:
+            del self.symbols[name]
+
+    def commit(self):
+        """Write the block's values for names the scope underneath had back to it."""
+        for name, value in self.symbols.items():
+            if self.parent.get_local(name) is not None: self.parent.set(name, value)
 
 
 class Context:
-    
+    __slots__ = ('display_name', 'root', 'parent', 'parent_entry_pos', 'symbol_table',
+                 'trampoline')
+
     def __init__(self, display_name, parent=None, parent_entry_pos=None, root='.'):
         self.display_name = display_name
         self.root = root
         self.parent = parent
         self.parent_entry_pos = parent_entry_pos
         self.symbol_table = None
+        # set on function call contexts that can resolve tail calls
+        self.trampoline = False
@@ -1,49 +1,20 @@
+import sys
 import unittest
+from array import array
 
 from safyr.interpreter import *
+from safyr.library import *
 from safyr.lexer import *
 from safyr.parser import *
 from safyr.constants import *
+from safyr.specialize import *
 
 
 BRK = Token('EOF', None)
 POS = Position(0,0,0,0,0)
 
 def get_sym_table():
-    global_symbol_table = SymbolTable()
-    global_symbol_table.set("null", Number(0))
-    global_symbol_table.set("T", Number(1))
-    global_symbol_table.set("F", Number(0))
-    global_symbol_table.set("static-typing", Number(0))
-    global_symbol_table.globals = list(global_symbol_table.symbols.keys())
-
-    global_symbol_table.set("print", BuiltInFunction.print)
-    global_symbol_table.set("rprint", BuiltInFunction.rprint)
-    global_symbol_table.set("input", BuiltInFunction.input)
-    global_symbol_table.set("inputint", BuiltInFunction.input_int)
-    global_symbol_table.set("CLEAR", BuiltInFunction.clear)
-    global_symbol_table.set("CLS", BuiltInFunction.clear)
-    global_symbol_table.set("isnum", BuiltInFunction.is_number)
-    global_symbol_table.set("isstr", BuiltInFunction.is_string)
-    global_symbol_table.set("islst", BuiltInFunction.is_list)
-    global_symbol_table.set("isfun", BuiltInFunction.is_function)
-    global_symbol_table.set("pop", BuiltInFunction.pop)
-    global_symbol_table.set("append", BuiltInFunction.append)
-    global_symbol_table.set("extend", BuiltInFunction.extend)
-    global_symbol_table.set("keys", BuiltInFunction.keys)
-    global_symbol_table.set("values", BuiltInFunction.values)
-    global_symbol_table.set("open", BuiltInFunction.open)
-    global_symbol_table.set("read", BuiltInFunction.read)
-    global_symbol_table.set("write", BuiltInFunction.write)
-    global_symbol_table.set("close", BuiltInFunction.close)
-    global_symbol_table.set("range", BuiltInFunction.range)
-    global_symbol_table.set("rand", BuiltInFunction.rand)
-    global_symbol_table.set("len", BuiltInFunction.len)
-    global_symbol_table.set("type", BuiltInFunction.type)
-
-    global_symbol_table.globals = list(global_symbol_table.symbols.keys())
-
-    return global_symbol_table
+    return program_table()
 
 
 RUN = Interpreter()
@@ -283,6 +254,43 @@ class TestInterpreterVariableAssignment(unittest.TestCase):
         RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
         self.assertEqual(context.symbol_table.symbols['a'], Number(47))
 
+    def test_global_var_visible_to_later_calls(self):
+        text = (': setglobal [] <~ {\nglobal a = 47\n}\n'
+                ':geta [] <~ a\n'
+                'setglobal()\nb = geta()')
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIn('a', context.symbol_table.globals)
+        self.assertEqual(context.symbol_table.symbols['b'], Number(47))
+
+    def test_globals_assigned_as_list(self):
+        table = SymbolTable()
+        table.set('a', Number(1))
+        table.globals = ['a']
+        self.assertIsInstance(table.globals, set)
+        self.assertEqual(SymbolTable(table).get('a'), Number(1))
+
+    def test_chain_cache_dropped_on_delete(self):
+        root = SymbolTable()
+        root.set('a', Number(1))
+        root.globals = ['a']
+        child = SymbolTable(root)
+        self.assertEqual(child.get('a'), Number(1))
+        self.assertIs(child.resolved['a'], root)
+        root.remove('a')
+        self.assertIsNone(child.get('a'))
+
+    def test_chain_cache_dropped_on_shadow(self):
+        root = SymbolTable()
+        root.set('a', Number(1))
+        root.globals = ['a']
+        mid = SymbolTable(root)
+        mid.globals = ['a']
+        child = SymbolTable(mid)
+        self.assertEqual(child.get('a'), Number(1))
+        mid.set('a', Number(2))
+        self.assertEqual(child.get('a'), Number(2))
+
 
 class TestInterpreterStringOperations(unittest.TestCase):
 
@@ -582,6 +590,118 @@ class TestInterpreterListOperations(unittest.TestCase):
         self.assertEqual(result, Number(0))
 
 
+class TestInterpreterArrayOperations(unittest.TestCase):
+
+    def test_array_from_list(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('a = array([1 2 3])\nb = array([1 2.5])').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Array(array('q', [1, 2, 3])))
+        self.assertEqual(context.symbol_table.get('b'), Array(array('d', [1, 2.5])))
+
+    def test_array_of_non_numbers(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('a = array([1 "x"])').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+    def test_array_arithmetic(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array([1 2 3])\nb = a * 2 + a\nc = 10 - a\nd = a / 2\ne = a % 2\nf = 2 ^ a'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Array(array('q', [3, 6, 9])))
+        self.assertEqual(context.symbol_table.get('c'), Array(array('q', [9, 8, 7])))
+        self.assertEqual(context.symbol_table.get('d'), Array(array('d', [0.5, 1, 1.5])))
+        self.assertEqual(context.symbol_table.get('e'), Array(array('q', [1, 0, 1])))
+        self.assertEqual(context.symbol_table.get('f'), Array(array('q', [2, 4, 8])))
+
+    def test_array_negative_power(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('a = array([1 2]) ^ -1').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Array(array('d', [1, 0.5])))
+
+    def test_array_comparison(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array([1 2 3])\nb = a > 1\nc = a == array([1 0 3])\nd = a == "s"'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Array(array('q', [0, 1, 1])))
+        self.assertEqual(context.symbol_table.get('c'), Array(array('q', [1, 0, 1])))
+        self.assertEqual(context.symbol_table.get('d'), Number(0))
+
+    def test_array_size_mismatch(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('a = array([1 2]) + array([1])').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+    def test_array_division_by_zero(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('a = 4 / array([1 0])').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+        self.assertEqual(e.details, 'Division by zero')
+
+    def test_array_slices(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array([1 2 3])\nb = a </ 2\nc = a /> 2\nd = a @ 1'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Array(array('q', [1, 2])))
+        self.assertEqual(context.symbol_table.get('c'), Array(array('q', [2, 3])))
+        self.assertEqual(context.symbol_table.get('d'), Number(2))
+
+    def test_array_element_assignment(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array([1 2 3])\nb = a\na @ 0 = 9\na @ 1 += 5'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Array(array('q', [9, 7, 3])))
+
+    def test_array_element_type_kept(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('a = array([1 2])\na @ 0 = 1.5').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+        self.assertEqual(context.symbol_table.get('a'), Array(array('q', [1, 2])))
+
+    def test_array_reductions(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array(range(5))\ns = sum(a)\nm = mean(a)\nx = min(a)\ny = max(a)\nz = sum([1 2.5])'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('s'), Number(10))
+        self.assertEqual(context.symbol_table.get('m').value, 2.0)
+        self.assertEqual(context.symbol_table.get('x'), Number(0))
+        self.assertEqual(context.symbol_table.get('y'), Number(4))
+        self.assertEqual(context.symbol_table.get('z').value, 3.5)
+
+    def test_reduction_of_empty_array(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('m = min(array([]))').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+    def test_foreach_over_array(self):
+        context.symbol_table = get_sym_table()
+        text = 'x = 0\nforeach e in array([1 2 3]) {\nx = x + e\n}'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(6))
+
+    def test_array_contains(self):
+        result = RUN.visit(Parser(Lexer().tokenize('array([1 2]) ~> 2').value).parse().node, context).value
+        self.assertEqual(result, Number(1))
+
+    def test_array_truth(self):
+        context.symbol_table = get_sym_table()
+        text = 'a = array([1 2 3])\nx = ? a == 7: 1 !: 0\ny = ? a == 3: 1 !: 0'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(0))
+        self.assertEqual(context.symbol_table.get('y'), Number(1))
+
+    def test_list_contains_array_whole(self):
+        context.symbol_table = get_sym_table()
+        text = 'l = [array([1 2 3])]\nx = l ~> 3\ny = l ~> array([1 2 3])'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(0))
+        self.assertEqual(context.symbol_table.get('y'), Number(1))
+
+    def test_array_map_key(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('m = {array([1]): 2}').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+
 class TestInterpreterMapOperations(unittest.TestCase):
 
     # + - ~> == !=
@@ -782,6 +902,179 @@ class TestInterpreterMathExpressions(unittest.TestCase):
                          Number(64))
 
 
+class TestInterpreterNumericFastPath(unittest.TestCase):
+
+    def test_numeric_expression_specialized(self):
+        node = Parser(Lexer().tokenize('a=2\nb = a * 3 + 1 < 10').value).parse().node
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertTrue(node.elements[1].value_node.numeric)
+        self.assertEqual(context.symbol_table.get('b'), Number(1))
+
+    def test_call_not_specialized(self):
+        node = Parser(Lexer().tokenize('a = len("abc") + 1').value).parse().node
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertFalse(node.elements[0].value_node.numeric)
+        self.assertEqual(context.symbol_table.get('a'), Number(4))
+
+    def test_specialized_keeps_left_operand_position(self):
+        text = 'a = 3\na - 1'
+        context.symbol_table = get_sym_table()
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        RUN.visit(node.elements[0], context)
+        result = RUN.visit(node.elements[1], context).value
+        self.assertEqual(result.pos_start.idx, node.elements[1].left_node.pos_start.idx)
+        self.assertIs(result.context, context)
+
+    def test_specialized_falls_back_for_strings(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('a = "x"\nb = a + "y"').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), String('xy'))
+
+    def test_specialized_division_by_zero(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('a = 0\nb = 4 / a').value).parse().node, context)
+        self.assertIsInstance(res.error, RuntimeError)
+        self.assertEqual(res.error.details, 'Division by zero')
+
+    def test_specialized_loop(self):
+        text = 'a = 0\nfor i = 0 .. 100: a = a + i * 2 - 1'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(9800))
+
+
+class TestInterpreterSuperinstructions(unittest.TestCase):
+
+    def test_fused_nodes(self):
+        text = 'a = [1 2]\nx = 0\nx += 1\nx = x - 1\ny = a @ x\n? x < 2: x = 1\nforeach e in a {\ne\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        self.assertEqual([type(n) for n in node.elements[2:]],
+                         [StepAssignNode, StepAssignNode, VarAssignNode, CompareBranchNode, ForEachExprNode])
+        self.assertIsInstance(node.elements[4].value_node, IndexNode)
+
+    def test_step_assign(self):
+        text = 'a = 1\nfor i = 0 .. 5 {\na += 2\na = a - 1\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(6))
+
+    def test_step_assign_const(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('const a = 1\na += 1').value).parse().node, context)
+        self.assertIsInstance(res.error, ConstantViolationError)
+
+    def test_step_assign_static(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('int a = 1\na += 2.5').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(3))
+        self.assertTrue(context.symbol_table.get('a').static)
+
+    def test_step_assign_trigger(self):
+        text = 'a = 1\nb = 0\nwhen a == 3: b = 57\nwhile b != 57: a += 1'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(3))
+
+    def test_index(self):
+        text = 'a = [4 5 6]\ni = 2\nb = a @ i + a @ 0'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Number(10))
+
+    def test_index_out_of_range(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('a = [4 5 6]\nb = a @ 3').value).parse().node, context)
+        self.assertIsInstance(res.error, InvalidSyntaxError)
+
+    def test_foreach_expression(self):
+        text = 'a = [1 2 3]\nb = foreach e in a {\ne * 2\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), List([Number(2), Number(4), Number(6)]))
+
+    def test_compare_branch(self):
+        text = 'a = 0\nfor i = 0 .. 10 {\n? i < 3: a += 1 !? i < 6: a += 10 !: a += 100\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(433))
+
+    def test_compare_branch_falls_back(self):
+        text = 'a = "s"\nb = 0\n? a == "s": b = 1'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Number(1))
+
+
+class TestInterpreterValueEvaluation(unittest.TestCase):
+
+    def test_visit_returns_runtime_result(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('"a" + "b" + "c"').value).parse().node, context)
+        self.assertIsInstance(res, RuntimeResult)
+        self.assertEqual(res.value, String('abc'))
+
+    def test_value_of_returns_raw_value(self):
+        context.symbol_table = get_sym_table()
+        node = Parser(Lexer().tokenize('"a" + "b"').value).parse().node.elements[0]
+        self.assertEqual(RUN.value_of(node, context), String('ab'))
+
+    def test_value_of_raises_signal_on_error(self):
+        context.symbol_table = get_sym_table()
+        node = Parser(Lexer().tokenize('1 + (2 * nope)').value).parse().node.elements[0]
+        with self.assertRaises(Signal) as cm:
+            RUN.value_of(node, context)
+        self.assertIsInstance(cm.exception.result.error, VariableAccessError)
+
+    def test_nested_error_reaches_top_level(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('a = len("x" + (1 - nope))').value).parse().node, context)
+        self.assertIsInstance(res.error, VariableAccessError)
+        self.assertIsNone(context.symbol_table.get('a'))
+
+    def test_break_inside_assigned_value(self):
+        text = 'i = 0\nwhile 1 {\ni += 1\nb = ? i > 3: break !: 0\n}'
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsNone(res.error)
+        self.assertEqual(context.symbol_table.get('i'), Number(4))
+
+    def test_success_clears_earlier_outcome(self):
+        res = RuntimeResult().failure(RuntimeError(POS, POS, 'x', context))
+        res.success(Number(1))
+        self.assertIsNone(res.error)
+        self.assertFalse(res.should_return())
+        res.success_break()
+        self.assertIsNone(res.value)
+        self.assertTrue(res.loop_should_break)
+
+
+class TestInterpreterDispatch(unittest.TestCase):
+
+    def test_handler_cached_per_node_type(self):
+        interpreter = Interpreter()
+        node = Parser(Lexer().tokenize('1').value).parse().node.elements[0]
+        interpreter.visit(node, context)
+        self.assertIn(NumberNode, interpreter.handlers)
+        self.assertIn(NumberNode, Interpreter.dispatch)
+
+    def test_subclass_visitor_picked_up(self):
+        class Doubling(Interpreter):
+            def visit_NumberNode(self, node, context):
+                return RuntimeResult().success(Number(node.tok.value * 2))
+
+        node = Parser(Lexer().tokenize('21').value).parse().node.elements[0]
+        RUN.visit(node, context)
+        self.assertEqual(Doubling().visit(node, context).value, Number(42))
+        self.assertEqual(RUN.visit(node, context).value, Number(21))
+        self.assertIsNot(Doubling.dispatch, Interpreter.dispatch)
+
+    def test_missing_visitor(self):
+        res = RUN.visit(Node(POS, POS), context)
+        self.assertIsInstance(res.error, RuntimeError)
+
+
 class TestInterpreterBasicComparators(unittest.TestCase):
 
     def test_num_eq_true(self):
@@ -1956,6 +2249,47 @@ class TestInterpreterBasicForEach(unittest.TestCase):
         self.assertEqual(context.symbol_table.symbols['a'], Number(5))
 
 
+class TestInterpreterLoopResults(unittest.TestCase):
+
+    def test_top_level_loop_keeps_results(self):
+        node = Parser(Lexer().tokenize('for i = 0 .. 3: i').value).parse().node
+        self.assertFalse(node.elements[0].discard)
+        result = RUN.visit(node, context).value
+        self.assertEqual(result, List([Number(0), Number(1), Number(2)]))
+
+    def test_statement_loops_discard_results(self):
+        text = 'a = 0\nfor i = 0 .. 3: a += i\nforeach i in [1 2]: a += i\nwhile a < 10: a += 1'
+        node = Parser(Lexer().tokenize(text).value).parse(result_used=False).node
+        self.assertTrue(all(n.discard for n in node.elements[1:]))
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(10))
+
+    def test_function_body_loop_discards_results(self):
+        text = ':f [n] <~ {\nt = 0\nfor i = 0 .. n {\nt += i\n}\nreturn t\n}\nx = f(5)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        self.assertTrue(node.elements[0].body_node.elements[1].discard)
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(10))
+
+    def test_assigned_loop_keeps_results(self):
+        text = 'b = foreach i in [1 2 3]: i * i'
+        node = Parser(Lexer().tokenize(text).value).parse(result_used=False).node
+        self.assertFalse(node.elements[0].value_node.discard)
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertEqual(context.symbol_table.get('b'), List([Number(1), Number(4), Number(9)]))
+
+    def test_auto_return_loop_keeps_results(self):
+        text = ':f [n] <~ for i = 0 .. n: i\nx = f(2)'
+        node = Parser(Lexer().tokenize(text).value).parse(result_used=False).node
+        self.assertFalse(node.elements[0].body_node.discard)
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertEqual(context.symbol_table.get('x'), List([Number(0), Number(1)]))
+
+
 class TestInterpreterBasicIf(unittest.TestCase):
 
     # all combinations of conditionals in a single line
@@ -2281,9 +2615,380 @@ class TestInterpreterBasicFunctions(unittest.TestCase):
         RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
         self.assertEqual(context.symbol_table.symbols['a'], Number(10))
 
+    def test_named_func_with_multiple_defers(self):
+        text = ':f [a] <~ {\ndefer: c = c + 1\ndefer: c = c * 2\nc = a\nreturn c\n}\nx = f(3)\ny = f(3)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(8))
+        self.assertEqual(context.symbol_table.symbols['y'], Number(8))
+
+    def test_defer_plan_leaves_block_unchanged(self):
+        text = ':f [a] <~ {\ndefer: c = c * 10\nc = a\nreturn c\n}\nx = f(1)\ny = f(2)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        body = node.elements[0].body_node
+        elements = list(body.elements)
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertEqual(body.elements, elements)
+        self.assertIsInstance(body.elements[0], DeferNode)
+        self.assertEqual(body.plan, (elements[1], elements[0].body_node, elements[2]))
+        self.assertEqual(context.symbol_table.symbols['y'], Number(20))
+
     # need tests for no argument functions and wrong number of arguments
 
 
+class TestInterpreterCallFastPath(unittest.TestCase):
+
+    def test_frames_reused(self):
+        text = ':f [a b] <~ {\nc = a + b\nreturn c\n}\nx = f(1 2)\ny = f(x 4)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertTrue(layout.closed)
+        self.assertEqual(len(layout.pool), 1)
+        self.assertEqual(layout.pool[0].frame, [None] * layout.size)
+        self.assertEqual(context.symbol_table.symbols['y'], Number(7))
+
+    def test_call_table_reused(self):
+        text = ':f [a] <~ a + 1\nx = f(1)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        pooled = layout.pool[0]
+        self.assertIsNone(pooled.parent)
+        RUN.visit(Parser(Lexer().tokenize('y = f(x)').value).parse().node, context)
+        self.assertEqual(layout.pool, [pooled])
+        self.assertEqual(context.symbol_table.symbols['y'], Number(3))
+
+    def test_escaping_value_keeps_call_context(self):
+        text = ':f [a] <~ {\nb = a + 1\nreturn [b]\n}\nl = f(1)\nx = f(2)\ny = (l @ 0) - "s"'
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context).error
+        self.assertEqual(e.context.display_name, 'f')
+        self.assertIs(e.context.parent, context)
+
+    def test_failed_call_context_not_pooled(self):
+        text = ':f [a] <~ a + "s"\nx = f(1)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(node, context)
+        self.assertIsNotNone(res.error)
+        self.assertEqual(layout.pool, [])
+        self.assertIs(res.error.context.parent, context)
+
+    def test_recursive_frames(self):
+        text = ':fib [n] <~ {\n? n < 2: return n\nreturn fib(n - 1) + fib(n - 2)\n}\nx = fib(12)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(144))
+
+    def test_inner_definition_not_pooled(self):
+        text = ':f [a] <~ {\n:g [b] <~ b + a\nreturn g\n}\nh = f(1)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertFalse(layout.closed)
+        self.assertEqual(layout.pool, [])
+
+    def test_local_helper_pooled(self):
+        text = ':f [n] <~ {\n:sq [x] <~ x * x\nreturn sq(n) + 1\n}\na = f(2)\nb = f(3)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertTrue(layout.closed)
+        self.assertEqual(len(layout.pool), 1)
+        self.assertEqual(context.symbol_table.symbols['b'], Number(10))
+
+    def test_escaping_helper_not_pooled(self):
+        for body in ('return sq(n)', 'l = [sq]\nreturn n', 'x = :[y] <~ y\nreturn n',
+                     '::p [a] {\nx = a\n}\nreturn n'):
+            text = f':f [n] <~ {{\n:sq [x] <~ x * x\n{body}\n}}'
+            node = Parser(Lexer().tokenize(text).value).parse().node
+            self.assertFalse(node.elements[0].layout.closed, body)
+
+    def test_when_in_function_pooled(self):
+        text = ':f [a] <~ {\nb = 0\nwhen a == 10: b = 57\na += 10\nreturn b\n}\nx = f(0)\ny = f(0)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        layout = node.elements[0].layout
+        context.symbol_table = get_sym_table()
+        RUN.visit(node, context)
+        self.assertTrue(layout.closed)
+        self.assertEqual(context.symbol_table.symbols['y'], Number(57))
+
+    def test_wrong_arity_reports_error(self):
+        text = ':f [a b] <~ a + b\nx = f(1)'
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsInstance(res.error, InvalidArgumentSetError)
+
+    def test_struct_argument_refreshed(self):
+        text = '::p [a] {\nx = a\n}\n:f [s] <~ s.x\nn = p(1)\nn.x = 4\ny = f(n)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['y'], Number(4))
+        self.assertEqual(context.symbol_table.symbols['n'].properties, {'x': Number(4)})
+
+    def test_struct_argument_refreshed_through_interface(self):
+        text = ('::mytype [a] {\nx = a\n.add <~ x += 1\n}\n:add [a b] <~ a + b\n'
+                'myvar = mytype(17)\nval = add(myvar 3)\nr = [myvar myvar.x]')
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        r = context.symbol_table.symbols['r'].elements
+        self.assertEqual(r[0].properties, {'x': Number(18)})
+        self.assertEqual(r[1], Number(18))
+
+
+class TestInterpreterSlotResolution(unittest.TestCase):
+
+    def test_function_locals_get_slots(self):
+        text = ':add [a b] <~ {\nc = a + b\nreturn c\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node.elements[0]
+        self.assertEqual(node.layout.slots, {'a': 0, 'b': 1, 'add': 2, 'c': 3})
+
+    def test_global_reads_not_slotted(self):
+        text = ':show [a] <~ print(a)'
+        node = Parser(Lexer().tokenize(text).value).parse().node.elements[0]
+        self.assertIsNone(node.body_node.node_to_call.layout)
+        self.assertEqual(node.body_node.arg_nodes[0].slot, 0)
+
+    def test_free_reads_marked_outer(self):
+        text = ':show [a] <~ print(a)'
+        node = Parser(Lexer().tokenize(text).value).parse().node.elements[0]
+        self.assertIs(node.body_node.node_to_call.outer, node.layout)
+        self.assertIsNone(node.body_node.arg_nodes[0].outer)
+
+    def test_interface_body_uses_struct_slots(self):
+        text = '::p [a] {\nx = a\n.size <~ x + a\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node.elements[0]
+        body = node.body_node.elements[1].body_node
+        self.assertIs(body.left_node.layout, node.layout)
+        self.assertEqual(body.left_node.slot, node.layout.slots['x'])
+
+    def test_global_declared_in_function_read_locally(self):
+        text = ':f [] <~ {\nglobal g = 2\nreturn g + len([1])\n}\nx = f()'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(3))
+
+    def test_function_with_try_gets_frame(self):
+        text = ':f [a] <~ {\ntry: a = a / 0\ncatch: a = 1\nreturn a\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node.elements[0]
+        self.assertEqual(node.layout.slots, {'a': 0, 'f': 1})
+
+    def test_slotted_locals(self):
+        text = ':f [a b] <~ {\nc = a * b\nc += 1\nreturn c\n}\nx = f(3 4)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(13))
+
+    def test_slotted_loop_variable(self):
+        text = ':f [n] <~ {\nt = 0\nfor i = 0 .. n: t += i\nreturn t\n}\nx = f(5)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(10))
+
+    def test_slotted_nested_call(self):
+        text = ':f [a] <~ {\nb = len(a)\nreturn b * len(a)\n}\nx = f([1 2 3])'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(9))
+
+    def test_slotted_locals_do_not_leak(self):
+        text = ':f [a] <~ {\nc = a\nreturn c\n}\nx = f(3)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertFalse('c' in context.symbol_table.symbols)
+
+    def test_slotted_delete(self):
+        text = ':f [a] <~ {\nc = a\ndel c\nreturn c\n}\nx = f(3)'
+        context.symbol_table = get_sym_table()
+        result = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsInstance(result.error, VariableAccessError)
+
+
+class TestInterpreterRecursion(unittest.TestCase):
+
+    def test_recursion(self):
+        text = ':fact [n] <~ {\n? n < 2: return 1\nreturn n * fact(n - 1)\n}\nx = fact(5)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(120))
+
+    def test_deep_recursion(self):
+        text = ':sum [n] <~ {\n? n < 1: return 0\nreturn n + sum(n - 1)\n}\nx = sum(3000)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(4501500))
+        self.assertEqual(RUN.call_stack, [])
+
+    def test_recursion_limit_restored(self):
+        text = ':sum [n] <~ {\n? n < 1: return 0\nreturn n + sum(n - 1)\n}\nx = sum(3000)'
+        context.symbol_table = get_sym_table()
+        limit = sys.getrecursionlimit()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(4501500))
+        self.assertEqual(sys.getrecursionlimit(), limit)
+
+    def test_deep_recursion_through_lazy_builtin(self):
+        text = ':f [n] <~ {\n? n == 0: return 0\nl = 0\nforeach v in transform(f [n - 1]): l = v\n'
+        text += 'return l + 1\n}\nx = f(30000)'
+        context.symbol_table = get_sym_table()
+        result = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsNone(result.error)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(30000))
+        self.assertEqual(RUN.call_stack, [])
+
+    def test_tail_recursion(self):
+        text = ':count [n acc] <~ {\n? n == 0: return acc\nreturn count(n - 1 acc + 2)\n}\n'
+        text += 'x = count(20000 0)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(40000))
+
+    def test_single_line_tail_recursion(self):
+        text = ':down [n] <~ {\n? n == 0: return 7\nreturn down(n - 1)\n}\n:go [n] <~ down(n)\n'
+        text += 'x = go(5)'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        self.assertTrue(node.elements[1].body_node.tail)
+
+    def test_tail_calls_marked(self):
+        text = ':f [n] <~ {\na = f(n)\nreturn f(n)\n}'
+        body = Parser(Lexer().tokenize(text).value).parse().node.elements[0].body_node
+        self.assertFalse(body.elements[0].value_node.tail)
+        self.assertTrue(body.elements[1].return_node.tail)
+
+    def test_call_in_try_not_tail(self):
+        text = ':f [n] <~ {\ntry: return f(n)\ncatch: return 0\n}'
+        body = Parser(Lexer().tokenize(text).value).parse().node.elements[0].body_node
+        self.assertFalse(body.elements[0].try_node.return_node.tail)
+
+    def test_toplevel_return_not_tail(self):
+        node = Parser(Lexer().tokenize('return len([])').value).parse().node
+        self.assertFalse(node.elements[0].return_node.tail)
+
+    def test_max_call_depth(self):
+        text = ':sum [n] <~ {\n? n < 1: return 0\nreturn n + sum(n - 1)\n}\nx = sum(50)'
+        context.symbol_table = get_sym_table()
+        interpreter = Interpreter()
+        interpreter.max_call_depth = 10
+        result = interpreter.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsInstance(result.error, RuntimeError)
+        self.assertEqual(interpreter.call_stack, [])
+
+
+class TestInterpreterGenerators(unittest.TestCase):
+
+    def test_generator_marked(self):
+        text = ':g [n] <~ {\nfor i = 0 .. n {\n? i > 1: yield i\n}\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        self.assertTrue(node.elements[0].generator)
+        self.assertTrue(node.elements[0].body_node.yields)
+
+    def test_generator_call_is_lazy(self):
+        text = 'a = 0\n:g [] <~ {\nyield 1\nyield 2\n}\nx = g()\nt = type(x)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsInstance(context.symbol_table.get('x'), Iterator)
+        self.assertEqual(context.symbol_table.get('t'), String('ITR'))
+
+    def test_generator_foreach(self):
+        text = ':g [n] <~ {\nfor i = 0 .. n {\n? i % 2 == 0: yield i * 10\n}\n}\nt = []\n'
+        text += 'foreach v in g(7): append(t v)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'), List([Number(0), Number(20), Number(40), Number(60)]))
+
+    def test_infinite_generator(self):
+        text = ':nat [] <~ {\ni = 0\nwhile T {\nyield i\ni += 1\n}\n}\nt = 0\n'
+        text += 'foreach v in nat() {\nt += v\n? v == 100: break\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'), Number(5050))
+
+    def test_generator_return_ends(self):
+        text = ':g [] <~ {\nforeach c in "xyz" {\n? c == "y": return\nyield c\n}\n}\nt = []\n'
+        text += 'foreach v in g(): append(t v)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'), List([String('x')]))
+
+    def test_generator_error(self):
+        text = ':g [] <~ {\nyield 1\nyield 1 / 0\n}\nt = []\nforeach v in g(): append(t v)'
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(res.error.details, 'Division by zero')
+        self.assertEqual(context.symbol_table.get('t'), List([Number(1)]))
+
+    def test_deep_recursive_generator(self):
+        text = ':g [n] <~ {\nif n > 0 {\nforeach v in g(n - 1): yield v\n}\nyield n\n}\nx = 0\n'
+        text += 'foreach v in g(500): x = x + v'
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsNone(res.error)
+        self.assertEqual(context.symbol_table.get('x'), Number(125250))
+        self.assertEqual(RUN.call_stack, [])
+
+    def test_recursive_generator_depth_limit(self):
+        text = ':g [n] <~ {\nif n > 0 {\nforeach v in g(n - 1): yield v\n}\nyield n\n}\nx = 0\n'
+        text += 'foreach v in g(50): x = x + v'
+        context.symbol_table = get_sym_table()
+        interpreter = Interpreter()
+        interpreter.max_call_depth = 10
+        res = interpreter.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(res.error.details, 'Maximum call depth exceeded')
+        self.assertEqual(interpreter.call_stack, [])
+
+    def test_yield_outside_function(self):
+        context.symbol_table = get_sym_table()
+        res = RUN.visit(Parser(Lexer().tokenize('yield 3').value).parse().node, context)
+        self.assertIsInstance(res.error, RuntimeError)
+
+
+class TestInterpreterLimits(unittest.TestCase):
+
+    def run_limited(self, text, **limits):
+        context.symbol_table = get_sym_table()
+        return Interpreter(**limits).visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+
+    def test_step_limit_stops_loop(self):
+        res = self.run_limited('x = 0\nwhile 1 {\nx += 1\n}', max_steps=50)
+        self.assertIsInstance(res.error, ResourceLimitError)
+        self.assertEqual(res.error.details, 'Step limit of 50 exceeded')
+        self.assertEqual(context.symbol_table.get('x'), Number(50))
+
+    def test_step_limit_not_reached(self):
+        res = self.run_limited('x = 0\nfor i = 0 .. 50: x += 1', max_steps=50)
+        self.assertIsNone(res.error)
+        self.assertEqual(context.symbol_table.get('x'), Number(50))
+
+    def test_step_limit_counts_calls(self):
+        res = self.run_limited(':f [n] <~ f(n + 1)\nf(0)', max_steps=100)
+        self.assertIsInstance(res.error, ResourceLimitError)
+
+    def test_time_limit(self):
+        res = self.run_limited('while 1 {\nx = 1\n}', time_limit=0.05)
+        self.assertIsInstance(res.error, ResourceLimitError)
+        self.assertEqual(res.error.details, 'Time limit of 0.05s exceeded')
+
+    def test_limit_not_caught(self):
+        res = self.run_limited('try {\nwhile 1 {\nx = 1\n}\n} catch {\ny = 2\n}', max_steps=10)
+        self.assertIsInstance(res.error, ResourceLimitError)
+        self.assertIsNone(context.symbol_table.get('y'))
+
+    def test_limit_rearmed(self):
+        interpreter = Interpreter(max_steps=5)
+        node = Parser(Lexer().tokenize('for i = 0 .. 10: i').value).parse().node
+        context.symbol_table = get_sym_table()
+        self.assertIsInstance(interpreter.visit(node, context).error, ResourceLimitError)
+        interpreter.limit(max_steps=20)
+        self.assertIsNone(interpreter.visit(node, context).error)
+
+
 class TestInterpreterBasicWhen(unittest.TestCase):
 
     def test_sl_when_dynamic(self):
@@ -2301,6 +3006,16 @@ class TestInterpreterBasicWhen(unittest.TestCase):
         a = context.symbol_table.symbols['a'].triggers
         self.assertEqual(a, [])
 
+    def test_when_gives_value_own_triggers(self):
+        text = 'a=1\nb=a\nwhen a == 10: b = 57\nc=a'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        a = context.symbol_table.symbols['a']
+        self.assertEqual(len(a.triggers), 1)
+        self.assertIs(context.symbol_table.symbols['c'].triggers, a.triggers)
+        self.assertFalse(context.symbol_table.symbols['b'].triggers)
+        self.assertFalse(hasattr(a, '__dict__'))
+
     def test_intentionally_trigger_when_with_equals_dynamic(self):
         text = 'a=1\nb=0\nwhen a == 10: b = 57\na = 10'
         context.symbol_table = get_sym_table()
@@ -2425,6 +3140,192 @@ class TestInterpreterBasicStruct(unittest.TestCase):
         self.assertEqual(a, Number(1))
 
 
+class TestInterpreterStructCopyOnWrite(unittest.TestCase):
+
+    def test_read_shares_properties(self):
+        text = '::mytype [a] {\nx = a\n}\nmyvar = mytype(1)\nother = myvar'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        a = context.symbol_table.symbols['myvar']
+        b = context.symbol_table.symbols['other']
+        self.assertIsNot(a, b)
+        self.assertIs(a.properties, b.properties)
+
+    def test_write_gives_copy_own_properties(self):
+        text = '::mytype [a] {\nx = a\n}\nmyvar = mytype(1)\nother = myvar\nmyvar.x = 12'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['myvar'].properties, {'x': Number(12)})
+        self.assertEqual(context.symbol_table.symbols['other'].properties, {'x': Number(1)})
+
+    def test_list_write_gives_copy_own_properties(self):
+        text = '::mytype [] {\nl = [1]\n}\nmyvar = mytype()\nother = myvar\nappend(myvar.l 2)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['other'].properties, {'l': List([Number(1)])})
+
+    def test_dead_copies_not_snapshotted(self):
+        text = '::mytype [a] {\nx = a\n}\nmyvar = mytype(1)\nfor i = 0 .. 10 {\nmyvar.x = myvar.x + 1\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['myvar'].properties, {'x': Number(11)})
+        self.assertEqual(len(Struct.shared), 0)
+
+
+class TestInterpreterStructInlineCache(unittest.TestCase):
+
+    def test_struct_layout(self):
+        text = '::mytype [a b] {\nx = a\ny = b\n}'
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        self.assertEqual(list(node.elements[0].layout.slots), ['a', 'b', 'x', 'y'])
+
+    def test_struct_instances_share_layout(self):
+        text = '::mytype [a] {\nx = a\n}\nm = mytype(1)\nn = mytype(2)'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        m = context.symbol_table.symbols['m'].context.symbol_table
+        n = context.symbol_table.symbols['n'].context.symbol_table
+        self.assertIs(m.layout, n.layout)
+
+    def test_dot_caches_slot(self):
+        text = '::mytype [a] {\nx = a\n}\nm = mytype(1)\nval = m.x'
+        context.symbol_table = get_sym_table()
+        node = Parser(Lexer().tokenize(text).value).parse().node
+        RUN.visit(node, context)
+        dot = node.elements[-1].value_node
+        self.assertIs(dot.ic_layout, node.elements[0].layout)
+        self.assertEqual(dot.ic_slot, 1)
+
+    def test_dot_cache_across_instances(self):
+        text = '::p [a b] {\nx = a\ny = b\n}\nval = 0\nforeach i in [p(1 2) p(3 4) p(5 6)] {\nval += i.x * i.y\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['val'], Number(44))
+
+    def test_dot_cache_different_structs(self):
+        text = '::p [a] {\nx = a\n}\n::q [a] {\nz = 0\nx = a\n}\nval = 0\nforeach i in [p(1) q(2) p(3)] {\nval += i.x\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['val'], Number(6))
+
+    def test_dot_cache_sees_assignment(self):
+        text = '::p [a] {\nx = a\n}\nm = p(1)\nval = 0\nfor i = 0 .. 2 {\nval += m.x\nm.x = 12\n}'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['val'], Number(13))
+
+    def test_dot_cache_nested_struct(self):
+        text = '::u [a] {\nx = a\n}\n::v [b] {\ny = b\n}\nn = v(u(11))\nval = n.y.x\nn.y.x = 5\nval = n.y.x'
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['val'], Number(5))
+
+
+class TestInterpreterConstants(unittest.TestCase):
+
+    def test_reads_share_constant(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('const k = 3\nl = [k k]').value).parse().node, context)
+        k = context.symbol_table.symbols['k']
+        self.assertTrue(k.frozen)
+        self.assertIs(context.symbol_table.symbols['l'].elements[0], k)
+        self.assertIs(context.symbol_table.symbols['l'].elements[1], k)
+
+    def test_assignment_copies_constant(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('const k = 3\ny = k').value).parse().node, context)
+        self.assertIsNot(context.symbol_table.symbols['y'], context.symbol_table.symbols['k'])
+        self.assertFalse(context.symbol_table.symbols['y'].frozen)
+
+    def test_element_write_leaves_constant(self):
+        context.symbol_table = get_sym_table()
+        text = 'const k = 3\nl = [k 2]\nl @ 0 = 9'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('k'), Number(3))
+        self.assertEqual(context.symbol_table.get('l'), List([Number(9), Number(2)]))
+
+    def test_element_write_to_literal_argument(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [a] <~ {\na @ 0 = 3\nreturn a\n}\nx = f(5)\ny = f(5) + 5'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(3))
+        self.assertEqual(context.symbol_table.get('y'), Number(8))
+        self.assertEqual(Number.of(5).value, 5)
+
+    def test_element_write_to_constant(self):
+        context.symbol_table = get_sym_table()
+        text = 'const a = 5\na @ 0 = 3'
+        res = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsInstance(res.error, ConstantViolationError)
+        self.assertEqual(context.symbol_table.get('a'), Number(5))
+
+    def test_constant_as_map_key(self):
+        context.symbol_table = get_sym_table()
+        text = 'const k = "a"\nm = {k: 1}\nx = m @ k'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(1))
+
+    def test_delete_constant(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('const k = 3\ndel k').value).parse().node, context).error
+        self.assertIsInstance(e, ConstantViolationError)
+        self.assertEqual(context.symbol_table.get('k'), Number(3))
+
+    def test_error_points_at_use(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('const k = 3\n\nx = k + "a"').value).parse().node, context).error
+        self.assertEqual(e.pos_start.ln, 2)
+
+    def test_constant_inlined_in_numeric_loop(self):
+        context.symbol_table = get_sym_table()
+        text = 'const k = 3\nx = 0\nfor i = 0 .. 4 {\nx = x + i * k\n}'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(18))
+
+    def test_global_cannot_rebind_constant(self):
+        context.symbol_table = get_sym_table()
+        text = 'const c = 5\n:f [] <~ {\nglobal c = 7\n}\ns = 0\ni = 0\nwhile i < 2 {\n'
+        text += 's = s * 10 + c\n? i == 0: f()\ni += 1\n}'
+        e = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context).error
+        self.assertIsInstance(e, ConstantViolationError)
+        self.assertEqual(context.symbol_table.get('c'), Number(5))
+
+    def test_comparisons_share_truth_values(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('l = [1 < 2 2 < 1]').value).parse().node, context)
+        l = context.symbol_table.symbols['l']
+        self.assertIs(l.elements[0], Number.true)
+        self.assertIs(l.elements[1], Number.false)
+
+    def test_literal_value_reused(self):
+        context.symbol_table = get_sym_table()
+        text = 'l = []\nfor i = 0 .. 2 {\nl = l + 7\n}'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        l = context.symbol_table.symbols['l']
+        self.assertIs(l.elements[0], l.elements[1])
+        self.assertTrue(l.elements[0].frozen)
+
+    def test_small_ints_shared(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('x = len([1 2])').value).parse().node, context)
+        self.assertEqual(context.symbol_table.symbols['x'], Number(2))
+        self.assertFalse(context.symbol_table.symbols['x'].frozen)
+        self.assertIs(Number.of(2), Number.of(2))
+        self.assertIsNot(Number.of(300), Number.of(300))
+
+    def test_when_leaves_literal(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [a] <~ {\nwhen a == 3: b = 1\na = 3\nreturn b\n}\nx = f(1)\ny = f(1)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('y'), Number(1))
+        self.assertFalse(Number.of(1).triggers)
+
+    def test_error_points_at_shared_value(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('x = 1\n\ny = (x < 2) + "a"').value).parse().node, context).error
+        self.assertEqual(e.pos_start.ln, 2)
+
+
 class TestInterpreterBasicImports(unittest.TestCase):
 
     def test_basic_moduleimport(self):
@@ -2546,6 +3447,153 @@ class TestInterpreterBuiltinFunctions(unittest.TestCase):
         res = RUN.visit(Parser(Lexer().tokenize('range(3)').value).parse().node, context).value
         return self.assertEqual(res, List([Number(0), Number(1), Number(2)]))
 
+    def test_transform_filter_take(self):
+        context.symbol_table = get_sym_table()
+        text = ':sq [x] <~ x * x\n:odd [x] <~ x % 2\nt = []\n'
+        text += 'foreach v in take(transform(sq filter(odd range(100000000))) 4): append(t v)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'), List([Number(1), Number(9), Number(25), Number(49)]))
+
+    def test_transform_error(self):
+        context.symbol_table = get_sym_table()
+        text = ':inv [x] <~ 1 / x\nforeach v in transform(inv [2 1 0]): v'
+        e = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context).error
+        self.assertEqual(e.details, 'Division by zero')
+
+    def test_take_wrongtype(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('take([1 2] "a")').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+    def test_transform_function_sees_builtins(self):
+        context.symbol_table = get_sym_table()
+        text = ':size [x] <~ len(x)\nt = []\nforeach v in transform(size ["ab" "c"]): append(t v)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'), List([Number(2), Number(1)]))
+
+    def test_memo_recursive(self):
+        context.symbol_table = get_sym_table()
+        text = ':fib [n] <~ {\n? n < 2: return n\nreturn fib(n - 1) + fib(n - 2)\n}\n'
+        text += 'fib = memo(fib 0)\nx = fib(60)\ns = memostats(fib)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(1548008755920))
+        stats = context.symbol_table.get('s').elements
+        self.assertEqual(stats[String('misses')], Number(61))
+        self.assertEqual(stats[String('hits')], Number(58))
+
+    def test_memo_lru_eviction(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [l] <~ len(l)\nf = memo(f 2)\na = f([1 2])\nb = f([1 2])\nc = f([1])\nd = f([1 2 3])\n'
+        text += 'e = f([1 2])\ns = memostats(f)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('e'), Number(2))
+        self.assertEqual(context.symbol_table.get('s'),
+                         Map({String('hits'): Number(1), String('misses'): Number(4),
+                              String('evictions'): Number(2), String('size'): Number(2),
+                              String('maxsize'): Number(2)}))
+
+    def test_memo_argument_changed_after_call(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [l] <~ len(l)\nf = memo(f 0)\nl = [1]\na = f(l)\nappend(l 2)\nb = f(l)\nc = f([1])'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('b'), Number(2))
+        self.assertEqual(context.symbol_table.get('c'), Number(1))
+
+    def test_memo_struct_argument_not_cached(self):
+        context.symbol_table = get_sym_table()
+        text = '::p [a] {\nx = a\n}\n:f [s] <~ s.x\nf = memo(f 3)\nn = p(4)\n'
+        text += 'for i = 0 .. 10: y = f(n)\ns = memostats(f)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('y'), Number(4))
+        stats = context.symbol_table.get('s').elements
+        self.assertEqual(stats[String('misses')], Number(0))
+        self.assertEqual(stats[String('evictions')], Number(0))
+        self.assertEqual(stats[String('size')], Number(0))
+
+    def test_memo_clear(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [x] <~ x + 1\nf = memo(f 8)\na = f(1)\nmemoclear(f)\na = f(1)\ns = memostats(f)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        stats = context.symbol_table.get('s').elements
+        self.assertEqual(stats[String('misses')], Number(1))
+        self.assertEqual(stats[String('size')], Number(1))
+
+    def test_builtin_groups_load_on_first_read(self):
+        table = BuiltinTable(GROUPS)
+        self.assertIn('rand', table.visible)
+        self.assertNotIn('rand', table.symbols)
+        self.assertIsInstance(table.get('rand'), BuiltInFunction)
+        self.assertIn('rand', table.symbols)
+        self.assertNotIn('rand', table.pending)
+
+    def test_builtin_namespace_shared_and_read_only(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('len = 3\nrand = 4').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('len'), Number(3))
+        self.assertIsInstance(get_sym_table().get('len'), BuiltInFunction)
+        self.assertRaises(TypeError, BUILTINS.set, 'len', Number(3))
+
+    def test_builtin_error_reported_in_call(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('pop(1 0)').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+        self.assertEqual(e.context.display_name, 'pop')
+
+    def test_memo_wrongtype(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('f = memo(1 2)').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+        e = RUN.visit(Parser(Lexer().tokenize(':f [x] <~ x\ns = memostats(f)').value).parse().node, context).error
+        self.assertIsInstance(e, RuntimeError)
+
+    def test_list_and_map_hashing(self):
+        self.assertEqual(hash(List([Number(1), String('a')])), hash(List([Number(1), String('a')])))
+        self.assertEqual(Map({String('a'): Number(1)}), Map({String('a'): Number(1)}))
+        self.assertEqual(hash(Map({String('a'): Number(1)})), hash(Map({String('a'): Number(1)})))
+
+    def test_zip(self):
+        context.symbol_table = get_sym_table()
+        text = 't = []\nforeach p in zip([1 2 3] "ab"): append(t p)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('t'),
+                         List([List([Number(1), String('a')]), List([Number(2), String('b')])]))
+
+    def test_range_is_lazy(self):
+        context.symbol_table = get_sym_table()
+        text = 'r = range(10000000)\na = len(r)\nb = r @ 9999999\nc = r ~> 5\nd = r ~> 10000000'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsNone(context.symbol_table.get('r').cell[0])
+        self.assertEqual(context.symbol_table.get('a'), Number(10000000))
+        self.assertEqual(context.symbol_table.get('b'), Number(9999999))
+        self.assertEqual(context.symbol_table.get('c'), Number(1))
+        self.assertEqual(context.symbol_table.get('d'), Number(0))
+
+    def test_range_foreach(self):
+        context.symbol_table = get_sym_table()
+        text = 'r = range(5)\nt = 0\nforeach i in r: t += i'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertIsNone(context.symbol_table.get('r').cell[0])
+        self.assertEqual(context.symbol_table.get('t'), Number(10))
+
+    def test_range_index_out_of_range(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('r = range(3)\nr @ 3').value).parse().node, context).error
+        self.assertIsInstance(e, InvalidSyntaxError)
+
+    def test_range_materializes_on_append(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('r = range(3)\nappend(r 7)\na = len(r)').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('r'), List([Number(0), Number(1), Number(2), Number(7)]))
+        self.assertEqual(context.symbol_table.get('a'), Number(4))
+
+    def test_range_negative_is_empty(self):
+        context.symbol_table = get_sym_table()
+        text = 'r = range(-3)\na = len(r)\nb = r ~> 0'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('a'), Number(0))
+        self.assertEqual(context.symbol_table.get('b'), Number(0))
+        self.assertEqual(context.symbol_table.get('r').elements, [])
+
     def test_len_list(self):
         context.symbol_table = get_sym_table()
         res = RUN.visit(Parser(Lexer().tokenize('len([1 2])').value).parse().node, context).value
@@ -2631,6 +3679,23 @@ class TestInterpreterBuiltinFunctions(unittest.TestCase):
         nota = 'a' not in context.symbol_table.symbols
         self.assertTrue(a and nota)
 
+    def test_delete_missing(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('del nothere').value).parse().node, context).error
+        self.assertIsInstance(e, VariableAccessError)
+        self.assertEqual(e.details, 'Variable nothere does not exist')
+
+    def test_delete_builtin(self):
+        context.symbol_table = get_sym_table()
+        e = RUN.visit(Parser(Lexer().tokenize('del print').value).parse().node, context).error
+        self.assertIsInstance(e, BuiltinViolationError)
+        self.assertIsInstance(context.symbol_table.get('print'), BuiltInFunction)
+
+    def test_delete_shadowed_builtin(self):
+        context.symbol_table = get_sym_table()
+        RUN.visit(Parser(Lexer().tokenize('len = 3\ndel len\nx = len([1])').value).parse().node, context)
+        self.assertEqual(context.symbol_table.get('x'), Number(1))
+
 
 class TestInterpreterChainedAccessOperators(unittest.TestCase):
 
@@ -2877,6 +3942,38 @@ class TestInterpreterErrorHandler(unittest.TestCase):
         res = context.symbol_table.get('a')
         return self.assertEqual(res, Number(3))
 
+    def test_failed_try_writes_undone(self):
+        context.symbol_table = get_sym_table()
+        text = 'a=1\nb=2\ntry{\na=5\nc=a\nb=b/0\n}\ncatch{\nd=a+c\n}'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node,
+                  context)
+        self.assertEqual(context.symbol_table.get('a'), Number(1))
+        self.assertEqual(context.symbol_table.get('b'), Number(2))
+        self.assertIsNone(context.symbol_table.get('c'))
+        self.assertIsNone(context.symbol_table.get('d'))
+
+    def test_delete_in_try_kept_local(self):
+        context.symbol_table = get_sym_table()
+        text = 'a=1\ntry{\ndel a\nb=a\n}\ncatch:c=1'
+        e = RUN.visit(Parser(Lexer().tokenize(text).value).parse().node, context).error
+        self.assertIsNone(e)
+        self.assertEqual(context.symbol_table.get('a'), Number(1))
+
+    def test_nested_try(self):
+        context.symbol_table = get_sym_table()
+        text = 'a=1\ntry{\ntry{\na=len([1 2])\n}\ncatch:a=9\n}\ncatch:a=7'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node,
+                  context)
+        self.assertEqual(context.symbol_table.get('a'), Number(2))
+
+    def test_try_in_function(self):
+        context.symbol_table = get_sym_table()
+        text = ':f [x] <~ {\ny = 1\ntry{\nz = 5\ny = x/0\n}\ncatch:y = y+z\nreturn y\n}\nr = f(4)\ns = f(4)'
+        RUN.visit(Parser(Lexer().tokenize(text).value).parse().node,
+                  context)
+        self.assertEqual(context.symbol_table.get('r'), Number(6))
+        self.assertEqual(context.symbol_table.get('s'), Number(6))
+
 
 def main():
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 from safyr.interpreter import *
+from safyr.library import *
 from safyr.lexer import *
 from safyr.parser import *
 from safyr.constants import *
@@ -9,40 +10,7 @@ BRK = Token('EOF', None)
 POS = Position(0,0,0,0,0)
 
 def get_sym_table():
-    global_symbol_table = SymbolTable()
-    global_symbol_table.set("null", Number(0))
-    global_symbol_table.set("T", Number(1))
-    global_symbol_table.set("F", Number(0))
-    global_symbol_table.set("static-typing", Number(0))
-    global_symbol_table.globals = list(global_symbol_table.symbols.keys())
-
-    global_symbol_table.set("print", BuiltInFunction.print)
-    global_symbol_table.set("rprint", BuiltInFunction.rprint)
-    global_symbol_table.set("input", BuiltInFunction.input)
-    global_symbol_table.set("inputint", BuiltInFunction.input_int)
-    global_symbol_table.set("CLEAR", BuiltInFunction.clear)
-    global_symbol_table.set("CLS", BuiltInFunction.clear)
-    global_symbol_table.set("isnum", BuiltInFunction.is_number)
-    global_symbol_table.set("isstr", BuiltInFunction.is_string)
-    global_symbol_table.set("islst", BuiltInFunction.is_list)
-    global_symbol_table.set("isfun", BuiltInFunction.is_function)
-    global_symbol_table.set("pop", BuiltInFunction.pop)
-    global_symbol_table.set("append", BuiltInFunction.append)
-    global_symbol_table.set("extend", BuiltInFunction.extend)
-    global_symbol_table.set("keys", BuiltInFunction.keys)
-    global_symbol_table.set("values", BuiltInFunction.values)
-    global_symbol_table.set("open", BuiltInFunction.open)
-    global_symbol_table.set("read", BuiltInFunction.read)
-    global_symbol_table.set("write", BuiltInFunction.write)
-    global_symbol_table.set("close", BuiltInFunction.close)
-    global_symbol_table.set("range", BuiltInFunction.range)
-    global_symbol_table.set("rand", BuiltInFunction.rand)
-    global_symbol_table.set("len", BuiltInFunction.len)
-    global_symbol_table.set("type", BuiltInFunction.type)
-
-    global_symbol_table.globals = list(global_symbol_table.symbols.keys())
-
-    return global_symbol_table
+    return program_table()
 
 
 RUN = Interpreter()
@@ -766,3 +734,10 @@ class TestParserErrors(unittest.TestCase):
             context.symbol_table = get_sym_table()
             e = Parser(Lexer().tokenize(text).value).parse().error
             if e: raise e
+
+    def test_yield_without_value(self):
+        with self.assertRaises(InvalidSyntaxError):
+            text = ':g [] <~ {\nyield\n}'
+            context.symbol_table = get_sym_table()
+            e = Parser(Lexer().tokenize(text).value).parse().error
+            if e: raise e